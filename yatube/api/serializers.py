@@ -0,0 +1,65 @@
+"""Сериализация моделей posts в простые словари для JSON-ответов.
+
+Поля поста можно сузить параметром ?fields=id,text: лишние ключи не
+собираются вовсе, так что клиент платит только за то, что читает.
+"""
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author', 'group', 'comment_count', 'image',
+)
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def parse_fields(request):
+    """Набор полей поста из ?fields= или все поля."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return POST_FIELDS
+    fields = tuple(field.strip() for field in raw.split(',') if field.strip())
+    unknown = sorted(set(fields) - set(POST_FIELDS))
+    if unknown:
+        raise FieldsError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def author_data(user):
+    return {'username': user.username, 'name': user.get_full_name()}
+
+
+def group_data(group):
+    return {'slug': group.slug, 'title': group.title}
+
+
+POST_GETTERS = {
+    'id': lambda post: post.id,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: author_data(post.author),
+    'group': lambda post: group_data(post.group) if post.group else None,
+    'comment_count': lambda post: post.comment_count,
+    'image': lambda post: post.image.url if post.image else None,
+}
+
+
+def post_data(post, fields):
+    return {field: POST_GETTERS[field](post) for field in fields}
+
+
+def comment_data(comment):
+    return {
+        'id': comment.id,
+        'text': comment.text,
+        'created': comment.created,
+        'author': author_data(comment.author),
+    }
+
+
+def page_data(page, serialize):
+    """Страница курсорной пагинации: элементы и токены соседних страниц."""
+    return {
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
@@ -0,0 +1,148 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='description'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            ) for i in range(13)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(post=cls.post, author=cls.reader, text='c')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_mirror_html_views(self):
+        """Ленты API отдают те же посты, что и HTML-страницы."""
+        pairs = (
+            ('api:index', 'posts:index', {}, self.guest_client),
+            ('api:group_list', 'posts:group_list', {'slug': 'group'},
+             self.guest_client),
+            ('api:profile', 'posts:profile', {'username': 'author'},
+             self.guest_client),
+            ('api:follow_index', 'posts:follow_index', {},
+             self.reader_client),
+        )
+        for api_name, html_name, kwargs, client in pairs:
+            with self.subTest(view=api_name):
+                data = client.get(reverse(api_name, kwargs=kwargs)).json()
+                page = client.get(
+                    reverse(html_name, kwargs=kwargs)
+                ).context['page_obj']
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.id for post in page],
+                )
+                following = client.get(
+                    reverse(api_name, kwargs=kwargs),
+                    {'after': data['next']},
+                ).json()
+                self.assertEqual(len(following['results']), 3)
+                self.assertIsNone(following['next'])
+
+    def test_post_serialization(self):
+        """Пост сериализуется компактно вместе с автором и группой."""
+        response = self.guest_client.get(reverse('api:index'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b', ', response.content)
+        self.assertIn('Пост 12'.encode(), response.content)
+        self.assertEqual(response.json()['results'][0], {
+            'id': self.post.id,
+            'text': 'Пост 12',
+            'pub_date': response.json()['results'][0]['pub_date'],
+            'author': {'username': 'author', 'name': 'Лев Толстой'},
+            'group': {'slug': 'group', 'title': 'Группа'},
+            'comment_count': 1,
+            'image': None,
+        })
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля."""
+        response = self.guest_client.get(
+            reverse('api:index'), {'fields': 'id,text'}
+        )
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'}
+        )
+        response = self.guest_client.get(
+            reverse('api:index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_and_post_detail(self):
+        """Профиль со статистикой и пост с комментариями."""
+        data = self.reader_client.get(
+            reverse('api:profile', kwargs={'username': 'author'})
+        ).json()['profile']
+        self.assertEqual(data['post_count'], 13)
+        self.assertEqual(data['follower_count'], 1)
+        self.assertTrue(data['following'])
+        data = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.id})
+        ).json()
+        self.assertEqual(data['post']['id'], self.post.id)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['c'],
+        )
+
+    def test_etags(self):
+        """Повторный запрос с ETag получает 304 и в API."""
+        urls = (
+            (reverse('api:index'), self.guest_client),
+            (reverse('api:post_detail', kwargs={'post_id': self.post.id}),
+             self.guest_client),
+            (reverse('api:follow_index'), self.reader_client),
+        )
+        for url, client in urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                repeated = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeated.status_code, 304)
+        response = self.guest_client.get(urls[0][0], {'fields': 'id'})
+        self.assertNotEqual(
+            response['ETag'], self.guest_client.get(urls[0][0])['ETag']
+        )
+
+    def test_unfollow_changes_follower_profile(self):
+        """Отписка меняет ETag профиля самого подписчика."""
+        url = reverse('api:profile', kwargs={'username': 'reader'})
+        response = self.reader_client.get(url)
+        self.assertEqual(response.json()['profile']['following_count'], 1)
+        Follow.objects.filter(user=self.reader).delete()
+        repeated = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(repeated.status_code, 200)
+        self.assertEqual(repeated.json()['profile']['following_count'], 0)
+
+    def test_errors(self):
+        """Чужие методы, анонимная лента подписок и 404 - в JSON."""
+        response = self.reader_client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
+        response = self.guest_client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.json())
+        response = self.guest_client.get(
+            reverse('api:group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
@@ -0,0 +1,156 @@
+"""JSON API только для чтения, зеркало лент и страниц posts.views.
+
+Ответы строятся на тех же запросах, кэше страниц и валидаторах, что и
+HTML-страницы, поэтому обе версии всегда показывают одни и те же данные,
+а повторный запрос с If-None-Match отдаёт 304 без сериализации.
+"""
+import hashlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+
+from posts import cache as feed_cache
+from posts.conditional import conditional_render
+from posts.counters import get_stats
+from posts.follows import is_following
+from posts.models import Group, Post, User
+from posts.timeline import follow_feed_paginator
+from posts.views import (
+    POSTS_PER_PAGE, feed_response, get_comments_page, get_cursor_page,
+    get_feed_page, post_etag,
+)
+
+from .serializers import (
+    FieldsError, author_data, comment_data, group_data, page_data, post_data,
+    parse_fields,
+)
+
+
+def json_response(data, status=200):
+    # Компактно: без пробелов и \u-экранирования кириллицы.
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def api_view(view):
+    """GET-only, ?fields= и ошибки в виде JSON."""
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = json_response({'error': 'Метод не разрешён.'}, 405)
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            fields = parse_fields(request)
+        except FieldsError as error:
+            return json_response({'error': str(error)}, 400)
+        try:
+            return view(request, fields, *args, **kwargs)
+        except Http404:
+            return json_response({'error': 'Не найдено.'}, 404)
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+def feed_data(request, queryset, scopes, fields, extra=dict):
+    """Лента постов; extra() - дополнительные ключи ответа."""
+    def build():
+        page = get_feed_page(request, queryset, scopes)
+        return json_response({
+            **extra(),
+            **page_data(page, lambda post: post_data(post, fields)),
+        })
+    return feed_response(request, queryset, scopes, build)
+
+
+@api_view
+def index(request, fields):
+    return feed_data(
+        request, Post.objects.for_feed(), [feed_cache.SITE_SCOPE], fields
+    )
+
+
+@api_view
+def group_posts(request, fields, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_data(
+        request,
+        Post.objects.for_feed().filter(group=group),
+        [feed_cache.group_scope(group.id)],
+        fields,
+        lambda: {
+            'group': {**group_data(group), 'description': group.description},
+        },
+    )
+
+
+@api_view
+def profile(request, fields, username):
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+
+    def extra():
+        stats = get_stats(user)
+        data = {
+            **author_data(user),
+            'post_count': stats.post_count,
+            'follower_count': stats.follower_count,
+            'following_count': stats.following_count,
+        }
+        if request.user.is_authenticated:
+            data['following'] = is_following(request.user.id, user.id)
+        return {'profile': data}
+
+    return feed_data(
+        request,
+        user.posts.for_feed(),
+        [feed_cache.author_scope(user.id)],
+        fields,
+        extra,
+    )
+
+
+@api_view
+def post_detail(request, fields, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
+    return conditional_render(
+        request,
+        post_etag(request, post),
+        lambda: json_response({
+            'post': post_data(post, fields),
+            'comments': page_data(
+                get_comments_page(request, post.id), comment_data
+            ),
+        }),
+    )
+
+
+@api_view
+def follow_index(request, fields):
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Нужна авторизация.'}, 401)
+    page = get_cursor_page(
+        request, follow_feed_paginator(request.user, POSTS_PER_PAGE)
+    )
+    response = json_response(
+        page_data(page, lambda post: post_data(post, fields))
+    )
+    # Лента зависит от множества авторов, поэтому ETag считается по телу:
+    # он экономит не работу сервера, а трафик клиента.
+    etag = 'W/"{}"'.format(hashlib.md5(response.content).hexdigest())
+    response = get_conditional_response(
+        request, etag=etag, response=response
+    )
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True, private=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,40 @@
+"""Загрузка вошедшего пользователя из кэша.
+
+AuthenticationMiddleware на каждом запросе достаёт пользователя по id из
+сессии. CachedModelBackend держит его в кэше сессий (сами сессии там же,
+SESSION_ENGINE cached_db), так что запрос авторизованного пользователя
+обходится без SELECT сессии и пользователя. Любое сохранение или
+удаление пользователя (смена и сброс пароля, вход) и выход сбрасывают
+запись, см. core/signals.py.
+
+Сброс виден всем воркерам, только если кэш сессий общий: с локальным
+кэшем ``manage.py check --deploy`` завершится ошибкой (core/checks.py).
+Запись в обход сигналов (QuerySet.update) кэш не сбрасывает - она
+устареет через USER_CACHE_TIMEOUT. USER_CACHE_TIMEOUT = 0 отключает кэш.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+USER_KEY = 'auth:user:{}'
+
+
+def user_cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def forget_user(user_id):
+    user_cache().delete(USER_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = USER_KEY.format(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache().set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,27 @@
+"""Проверки настроек, которые видны только в боевом окружении."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register('caches', deploy=True)
+def check_user_cache(app_configs, **kwargs):
+    """Кэш пользователей и сессий должен быть общим для всех воркеров.
+
+    В локальном кэше сброс записи после смены пароля или блокировки
+    виден только процессу, который сохранил пользователя, - остальные
+    пускали бы по старой сессии до USER_CACHE_TIMEOUT.
+    """
+    if not settings.USER_CACHE_TIMEOUT:
+        return []
+    backend = settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f'Кэш {settings.SESSION_CACHE_ALIAS!r} локален для процесса, а '
+        f'в нём хранятся вошедшие пользователи.',
+        hint='Укажите общий кэш (Memcached, Redis) или отключите кэш '
+             'пользователей: USER_CACHE_TIMEOUT = 0.',
+        id='core.E001',
+    )]
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает токен для заголовка X-Profile: запросы с ним '
+        'профилируются в течение PROFILE_TOKEN_MAX_AGE секунд.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
@@ -0,0 +1,273 @@
+"""Лёгкие метрики запросов в памяти процесса.
+
+MetricsMiddleware складывает по каждому маршруту (view_name) число
+запросов, гистограмму задержек, число и время SQL-запросов, попадания и
+промахи кэша и размер ответов. Агрегаты живут в словаре процесса под
+одной блокировкой; раз в METRICS_FLUSH_INTERVAL секунд процесс
+сбрасывает свой снимок в METRICS_DIR/<pid>-<старт процесса>.json, а
+эндпоинт /metrics складывает снимки всех воркеров и отдаёт их в
+текстовом формате Prometheus. Снимки умерших воркеров (pid не жив или
+уже занят другим процессом) и давно не обновлявшиеся удаляются при
+сборке, иначе их счётчики суммировались бы вечно.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Верхние границы корзин гистограммы задержек, в секундах.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+COUNTERS = (
+    'requests', 'latency_sum', 'db_queries', 'db_time', 'cache_hits',
+    'cache_misses', 'response_bytes',
+)
+
+_lock = threading.Lock()
+_routes = {}
+_last_flush = 0.0
+_local = threading.local()
+
+
+def _new_route():
+    route = dict.fromkeys(COUNTERS, 0)
+    route['buckets'] = [0] * len(LATENCY_BUCKETS)
+    route['statuses'] = defaultdict(int)
+    return route
+
+
+class RequestStats:
+    """Счётчики одного запроса, собираемые по ходу его обработки."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def end_request():
+    _local.stats = None
+
+
+def record_cache(hit):
+    """Отмечает попадание или промах кэша в текущем запросе."""
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+def record(view_name, status, latency, stats, response_bytes):
+    with _lock:
+        route = _routes.get(view_name)
+        if route is None:
+            route = _routes[view_name] = _new_route()
+        route['requests'] += 1
+        route['latency_sum'] += latency
+        route['db_queries'] += stats.db_queries
+        route['db_time'] += stats.db_time
+        route['cache_hits'] += stats.cache_hits
+        route['cache_misses'] += stats.cache_misses
+        route['response_bytes'] += response_bytes
+        route['statuses'][f'{status // 100}xx'] += 1
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                route['buckets'][index] += 1
+                break
+    maybe_flush()
+
+
+def snapshot():
+    with _lock:
+        return {
+            view_name: {**route, 'buckets': list(route['buckets']),
+                        'statuses': dict(route['statuses'])}
+            for view_name, route in _routes.items()
+        }
+
+
+def _process_start(pid):
+    """Время старта процесса в тиках с загрузки системы (Linux).
+
+    Вместе с pid отличает воркер от нового процесса, получившего тот же
+    pid; без /proc возвращает 0 и остаётся проверка по pid и mtime.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            stat = file.read()
+    except OSError:
+        return 0
+    # Имя процесса в скобках может содержать пробелы; starttime - 22-е
+    # поле, 20-е после имени.
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+def _snapshot_name(pid):
+    return f'{pid}-{_process_start(pid)}.json'
+
+
+def _is_alive(pid, started):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        pass
+    return _process_start(pid) == started
+
+
+def _is_stale(path, name):
+    try:
+        pid, started = (int(part) for part in name[:-5].split('-'))
+    except ValueError:
+        # Снимок в старом формате <pid>.json или чужой файл.
+        return True
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        return True
+    return not _is_alive(pid, started) or age > settings.METRICS_STALE_AFTER
+
+
+def flush():
+    """Сохраняет снимок процесса на диск для сборки соседними воркерами."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, _snapshot_name(os.getpid()))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(snapshot(), file)
+    os.replace(tmp_path, path)
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def reset():
+    global _last_flush
+    with _lock:
+        _routes.clear()
+    _last_flush = 0.0
+
+
+def merged():
+    """Сумма снимков живых процессов; свой процесс берётся из памяти."""
+    total = {}
+    snapshots = [snapshot()]
+    own = _snapshot_name(os.getpid())
+    if os.path.isdir(settings.METRICS_DIR):
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json') or name == own:
+                continue
+            path = os.path.join(settings.METRICS_DIR, name)
+            if _is_stale(path, name):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Соседний сборщик успел удалить его раньше.
+                    pass
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    for routes in snapshots:
+        for view_name, route in routes.items():
+            target = total.setdefault(view_name, _new_route())
+            for counter in COUNTERS:
+                target[counter] += route[counter]
+            for index, value in enumerate(route['buckets']):
+                target['buckets'][index] += value
+            for status, value in route['statuses'].items():
+                target['statuses'][status] += value
+    return total
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(
+            key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for key, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def render(routes):
+    """Текстовый формат экспозиции Prometheus."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('yatube_requests_total', 'counter', 'Обработанные запросы.')
+    for view_name, route in sorted(routes.items()):
+        for status, value in sorted(route['statuses'].items()):
+            lines.append(
+                'yatube_requests_total'
+                f'{_labels(view=view_name, status=status)} {value}'
+            )
+
+    family('yatube_request_duration_seconds', 'histogram',
+           'Время обработки запроса.')
+    for view_name, route in sorted(routes.items()):
+        cumulative = 0
+        for bound, value in zip(LATENCY_BUCKETS, route['buckets']):
+            cumulative += value
+            lines.append(
+                'yatube_request_duration_seconds_bucket'
+                f'{_labels(view=view_name, le=bound)} {cumulative}'
+            )
+        lines.append(
+            'yatube_request_duration_seconds_bucket'
+            f'{_labels(view=view_name, le="+Inf")} {route["requests"]}'
+        )
+        lines.append(
+            'yatube_request_duration_seconds_sum'
+            f'{_labels(view=view_name)} {route["latency_sum"]:.6f}'
+        )
+        lines.append(
+            'yatube_request_duration_seconds_count'
+            f'{_labels(view=view_name)} {route["requests"]}'
+        )
+
+    for name, counter, help_text in (
+        ('yatube_db_queries_total', 'db_queries', 'SQL-запросы.'),
+        ('yatube_db_query_seconds_total', 'db_time', 'Время SQL-запросов.'),
+        ('yatube_cache_hits_total', 'cache_hits', 'Попадания в кэш лент.'),
+        ('yatube_cache_misses_total', 'cache_misses', 'Промахи кэша лент.'),
+        ('yatube_response_bytes_total', 'response_bytes', 'Байты ответов.'),
+    ):
+        family(name, 'counter', help_text)
+        for view_name, route in sorted(routes.items()):
+            value = route[counter]
+            if isinstance(value, float):
+                value = f'{value:.6f}'
+            lines.append(f'{name}{_labels(view=view_name)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,176 @@
+import mimetypes
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, profiling, routers
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса по имени маршрута (см. core/metrics.py).
+
+    Стоит первым в MIDDLEWARE, чтобы задержка включала остальные слои.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            metrics.end_request()
+        latency = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        # Потоковые ответы не буферизуем ради подсчёта байтов.
+        size = 0 if response.streaming else len(response.content)
+        metrics.record(view_name, response.status_code, latency, stats, size)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по токену, ?profile=1 сотрудника или выборке.
+
+    Стоит после AuthenticationMiddleware: параметру запроса нужен
+    request.user. Снимки пишет core/profiling.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.requested(request):
+            return self.get_response(request)
+        response, snapshot = profiling.profile_request(
+            self.get_response, request
+        )
+        if snapshot is not None:
+            match = getattr(request, 'resolver_match', None)
+            view_name = match.view_name if match else '<unresolved>'
+            response[profiling.ID_HEADER] = profiling.save(
+                view_name, request, response.status_code, snapshot
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Решает, может ли запрос читать с реплики (см. core/routers.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_pinned(self, request):
+        return request.get_signed_cookie(
+            routers.PIN_COOKIE, default=None, salt=routers.PIN_SALT,
+            max_age=settings.REPLICA_PIN_SECONDS,
+        ) is not None
+
+    def __call__(self, request):
+        routers.start_request(
+            request.method not in routers.SAFE_METHODS
+            or self.is_pinned(request)
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request()
+        if wrote:
+            response.set_signed_cookie(
+                routers.PIN_COOKIE, '1', salt=routers.PIN_SALT,
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class PrecompressedStaticMiddleware:
+    """Раздаёт статику из STATIC_ROOT с готовым сжатием.
+
+    Из .br/.gz копий, сделанных collectstatic (core/storage.py), берётся
+    та, что принимает клиент. Файлы с хешем в имени кэшируются навсегда,
+    остальные - ненадолго. Если файла в STATIC_ROOT нет, запрос идёт
+    дальше (в разработке его отдаст staticfiles).
+    """
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+    QUALITY = re.compile(r'q=(\d+(?:\.\d*)?)')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._manifest = None
+        self._hashed_names = set()
+
+    def __call__(self, request):
+        response = None
+        if (request.method in ('GET', 'HEAD') and settings.STATIC_ROOT
+                and request.path.startswith(settings.STATIC_URL)):
+            response = self.serve(
+                request, request.path[len(settings.STATIC_URL):]
+            )
+        return response or self.get_response(request)
+
+    def accepted_encodings(self, request):
+        accepted = set()
+        for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            coding, *params = (value.strip() for value in part.split(';'))
+            qualities = [
+                param for param in params if param.lower().startswith('q=')
+            ]
+            if qualities:
+                # Кривой q-параметр - кодировка не принята, а не ошибка 500.
+                quality = self.QUALITY.fullmatch(qualities[0].lower())
+                if quality is None or float(quality.group(1)) <= 0:
+                    continue
+            accepted.add(coding.lower())
+        return accepted
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        accepted = self.accepted_encodings(request)
+        encoding = None
+        for coding, extension in self.ENCODINGS:
+            if coding in accepted and os.path.isfile(path + extension):
+                encoding, path = coding, path + extension
+                break
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if self.is_hashed(name):
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+            )
+        else:
+            response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+    def is_hashed(self, name):
+        # Манифест перечитывается вместе с хранилищем - тогда и множество.
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        if hashed_files is not self._manifest:
+            self._manifest = hashed_files
+            self._hashed_names = set(hashed_files.values())
+        return name in self._hashed_names
@@ -0,0 +1,213 @@
+"""Профилирование отдельных запросов на живом сервере.
+
+ProfilingMiddleware включает cProfile для запроса, если:
+
+* в заголовке X-Profile пришёл подписанный токен (``manage.py
+  profile_token``), - так можно профилировать и как гость;
+* сотрудник (is_staff) добавил к адресу ?profile=1;
+* запрос попал в случайную выборку PROFILE_SAMPLE_RATE.
+
+Вместе с pstats-дампом сохраняется хронология SQL: смещение от начала
+запроса, длительность и текст каждого запроса. Всё пишется в
+PROFILE_DIR/<view_name>/<id>.prof и <id>.json; у каждого маршрута
+хранятся только PROFILE_KEEP последних снимков. Id снимка возвращается
+в заголовке ответа X-Profile-Id, а страница /profiles/ для сотрудников
+показывает список и самые дорогие функции по cumulative time.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = 'profile'
+TOKEN_SALT = 'core.profiling'
+ID_HEADER = 'X-Profile-Id'
+# Имена каталогов и файлов снимков; с буквы, чтобы не пропустить '..'.
+_SAFE_NAME = re.compile(r'^\w[\w.-]*$')
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def _valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def requested(request):
+    """Нужно ли профилировать этот запрос."""
+    token = request.META.get(HEADER)
+    if token:
+        return _valid_token(token)
+    if request.GET.get(QUERY_PARAM):
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class SqlTimeline:
+    """Хронология SQL запроса; обёртка для connection.execute_wrapper."""
+
+    def __init__(self, alias, started):
+        self.alias = alias
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            finished = time.perf_counter()
+            self.queries.append({
+                'db': self.alias,
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((finished - started) * 1000, 3),
+                'sql': sql,
+            })
+
+
+def profile_request(get_response, request):
+    """Ответ и снимок (profiler, хронология SQL, длительность)."""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    timelines = [SqlTimeline(alias, started) for alias in connections]
+    with ExitStack() as stack:
+        for timeline in timelines:
+            stack.enter_context(
+                connections[timeline.alias].execute_wrapper(timeline)
+            )
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (например, отладчик).
+            return get_response(request), None
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+    queries = sorted(
+        (query for timeline in timelines for query in timeline.queries),
+        key=lambda query: query['start_ms'],
+    )
+    return response, (profiler, queries, duration)
+
+
+def _dir_name(view_name):
+    return re.sub(r'[^\w.-]', '_', view_name)
+
+
+def _view_dir(view_name):
+    if not _SAFE_NAME.match(view_name):
+        raise ValueError(f'Недопустимое имя маршрута: {view_name!r}')
+    return os.path.join(settings.PROFILE_DIR, view_name)
+
+
+def save(view_name, request, status, snapshot):
+    """Пишет снимок на диск и возвращает его id."""
+    profiler, queries, duration = snapshot
+    view_dir = _view_dir(_dir_name(view_name))
+    os.makedirs(view_dir, exist_ok=True)
+    # Время в начале id - снимки сортируются по имени.
+    profile_id = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(view_dir, profile_id)
+    profiler.dump_stats(path + '.prof')
+    meta = {
+        'id': profile_id,
+        'view_name': view_name,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': status,
+        'created': time.time(),
+        'duration_ms': round(duration * 1000, 3),
+        'db_time_ms': round(
+            sum(query['duration_ms'] for query in queries), 3
+        ),
+        'queries': queries,
+    }
+    with open(path + '.json', 'w') as meta_file:
+        json.dump(meta, meta_file)
+    _prune(view_dir)
+    return profile_id
+
+
+def _ids(view_dir):
+    return sorted(
+        (name[:-len('.json')] for name in os.listdir(view_dir)
+         if name.endswith('.json')),
+        reverse=True,
+    )
+
+
+def _prune(view_dir):
+    for profile_id in _ids(view_dir)[settings.PROFILE_KEEP:]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(view_dir, profile_id + extension))
+            except FileNotFoundError:
+                pass  # параллельный воркер уже удалил
+
+
+def _read_meta(view_dir, profile_id):
+    with open(os.path.join(view_dir, profile_id + '.json')) as meta_file:
+        return json.load(meta_file)
+
+
+def list_profiles():
+    """Снимки по маршрутам: {dir_name: [meta без SQL, от новых]}."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return {}
+    profiles = {}
+    for dir_name in sorted(os.listdir(settings.PROFILE_DIR)):
+        if not _SAFE_NAME.match(dir_name):
+            continue
+        view_dir = _view_dir(dir_name)
+        if not os.path.isdir(view_dir):
+            continue
+        entries = []
+        for profile_id in _ids(view_dir):
+            try:
+                meta = _read_meta(view_dir, profile_id)
+            except (FileNotFoundError, ValueError):
+                continue
+            meta['query_count'] = len(meta.pop('queries'))
+            entries.append(meta)
+        if entries:
+            profiles[dir_name] = entries
+    return profiles
+
+
+def load(dir_name, profile_id, limit):
+    """meta снимка и текст pstats с limit самых дорогих функций.
+
+    FileNotFoundError - снимка нет, ValueError - недопустимое имя.
+    """
+    if not _SAFE_NAME.match(profile_id):
+        raise ValueError(f'Недопустимый id снимка: {profile_id!r}')
+    view_dir = _view_dir(dir_name)
+    meta = _read_meta(view_dir, profile_id)
+    stream = io.StringIO()
+    stats = pstats.Stats(
+        os.path.join(view_dir, profile_id + '.prof'), stream=stream
+    )
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return meta, stream.getvalue()
@@ -0,0 +1,62 @@
+"""Чтение с реплик, запись в основную базу.
+
+ReplicaRoutingMiddleware отмечает, можно ли текущему запросу читать с
+реплики: только безопасным методам (GET/HEAD/OPTIONS) и только если
+клиент недавно ничего не записывал. Первая запись в запросе переключает
+его оставшиеся чтения на основную базу, а ответ получает подписанную
+куку, которая ещё REPLICA_PIN_SECONDS держит клиента на основной базе -
+так автор сразу видит свой пост, пока реплика догоняет.
+
+Вне запросов (команды, фоновые потоки) всё читается из основной базы.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'core.routers.pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def start_request(pinned):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def end_request():
+    """Сбрасывает состояние; возвращает True, если запрос что-то писал."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.pinned = True
+    _state.wrote = False
+    return wrote
+
+
+def reads_primary():
+    return getattr(_state, 'pinned', True) or not settings.DATABASE_REPLICAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reads_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем своё же, а не отстающую реплику.
+        _state.pinned = True
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На всех базах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с данными от основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
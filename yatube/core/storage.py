@@ -0,0 +1,62 @@
+"""Хранилище статики с отпечатками в именах и сжатыми копиями.
+
+collectstatic раскладывает файлы под именами с хешем содержимого
+(bootstrap.min.3f2a....css, манифест staticfiles.json) и рядом с каждым
+текстовым файлом кладёт .gz и, если установлен пакет brotli, .br.
+Раздаёт их PrecompressedStaticMiddleware: имя меняется вместе с
+содержимым, поэтому файлы можно кэшировать навсегда.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli не обязателен
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico',
+)
+# Мелкие файлы почти не сжимаются, а лишний файл на диске стоит места.
+MIN_COMPRESS_SIZE = 512
+
+
+def encoders():
+    """Пары (расширение, функция сжатия) доступных кодировок."""
+    available = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        available.insert(0, ('.br', brotli.compress))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # Без collectstatic манифеста нет (тесты, свежий checkout) -
+        # отдаём исходное имя вместо ошибки при рендере шаблона.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+            return
+        with open(path, 'rb') as file:
+            data = file.read()
+        for extension, encode in encoders():
+            compressed = encode(data)
+            # Сжатая копия, не давшая выигрыша, только добавит работы.
+            if len(compressed) < len(data) * 0.95:
+                with open(path + extension, 'wb') as file:
+                    file.write(compressed)
@@ -12,3 +12,17 @@ def addclass(field, css):
 # синтаксис @register... , под который описана функция addclass() - 
 # это применение "декораторов", функций, меняющих поведение функций
 # Не бойтесь соб@к
+
+
+@register.simple_tag(takes_context=True)
+def cursor_query(context, **cursor):
+    """Query string текущего запроса с заменой курсора пагинации.
+
+    Остальные параметры (например, поисковый запрос) сохраняются.
+    """
+    query = context['request'].GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    for key, value in cursor.items():
+        query[key] = value
+    return '?' + query.urlencode()
@@ -0,0 +1,399 @@
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import auth, checks, metrics, profiling, routers, storage
+from core.middleware import ReplicaRoutingMiddleware
+from posts.models import Post, User
+
+METRICS_DIR = tempfile.mkdtemp()
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.guest_client = Client()
+
+    def scrape(self):
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_route_counters(self):
+        """Запросы, SQL, кэш и байты считаются по имени маршрута."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="2xx"} 2', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text,
+        )
+        # Страница и её валидатор: оба промахиваются, затем оба попадают.
+        self.assertIn('yatube_cache_hits_total{view="posts:index"} 2', text)
+        self.assertIn('yatube_cache_misses_total{view="posts:index"} 2', text)
+        self.assertIn('yatube_db_queries_total{view="posts:index"} 2', text)
+        self.assertIn(
+            'yatube_response_bytes_total{view="posts:index"} '
+            f'{2 * len(response.content)}',
+            text,
+        )
+
+    def test_unresolved_route(self):
+        """Ненайденные адреса не плодят отдельных меток."""
+        self.guest_client.get('/no/such/page/')
+        self.assertIn(
+            'yatube_requests_total{view="<unresolved>",status="4xx"} 1',
+            self.scrape(),
+        )
+
+    def test_merges_worker_snapshots(self):
+        """Снимки других процессов складываются со своим."""
+        self.guest_client.get(reverse('posts:index'))
+        metrics.flush()
+        own = os.path.join(METRICS_DIR, metrics._snapshot_name(os.getpid()))
+        with open(own) as file:
+            snapshot = json.load(file)
+        # Родительский процесс жив - его снимок берётся в сумму.
+        sibling = os.path.join(
+            METRICS_DIR, metrics._snapshot_name(os.getppid())
+        )
+        with open(sibling, 'w') as file:
+            json.dump(snapshot, file)
+        try:
+            text = self.scrape()
+        finally:
+            os.remove(sibling)
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="2xx"} 2', text
+        )
+
+    def test_prunes_dead_worker_snapshots(self):
+        """Снимки умерших, подменённых и заглохших воркеров удаляются."""
+        self.guest_client.get(reverse('posts:index'))
+        snapshot = metrics.snapshot()
+        worker = subprocess.Popen(['true'])
+        worker.wait()
+        parent = os.getppid()
+        names = [
+            # pid завершившегося процесса.
+            metrics._snapshot_name(worker.pid),
+            # pid жив, но занят процессом с другим временем старта.
+            f'{parent}-{metrics._process_start(parent) + 1}.json',
+            # Старый формат имени.
+            f'{parent}.json',
+        ]
+        for name in names:
+            with open(os.path.join(METRICS_DIR, name), 'w') as file:
+                json.dump(snapshot, file)
+        # Живой, но давно не обновлявшийся снимок.
+        stale = os.path.join(METRICS_DIR, metrics._snapshot_name(parent))
+        with open(stale, 'w') as file:
+            json.dump(snapshot, file)
+        old = time.time() - settings.METRICS_STALE_AFTER - 1
+        os.utime(stale, (old, old))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="2xx"} 1', text
+        )
+        for name in names + [os.path.basename(stale)]:
+            self.assertFalse(os.path.exists(os.path.join(METRICS_DIR, name)))
+
+    def test_remote_clients_denied(self):
+        """Эндпоинт недоступен с нелокальных адресов."""
+        response = self.guest_client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def handle(self, request, write=False):
+        """Прогоняет запрос через middleware и запоминает базы чтения."""
+        def view(request):
+            self.reads.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                self.reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_safe_requests_read_replica(self):
+        """GET без недавних записей читает с реплики."""
+        response = self.handle(self.factory.get('/'))
+        self.assertEqual(self.reads, ['replica'])
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        """После записи запрос и следующие запросы клиента читают основную."""
+        response = self.handle(self.factory.post('/'), write=True)
+        self.assertEqual(self.reads, ['default', 'default'])
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertTrue(cookie['httponly'])
+        request = self.factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = cookie.value
+        self.handle(request)
+        self.assertEqual(self.reads[-1], 'default')
+
+    def test_write_during_get(self):
+        """Запись посреди GET переключает оставшиеся чтения."""
+        response = self.handle(self.factory.get('/'), write=True)
+        self.assertEqual(self.reads, ['replica', 'default'])
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_forged_cookie_ignored(self):
+        """Неподписанная кука не закрепляет клиента за основной базой."""
+        request = self.factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.handle(request)
+        self.assertEqual(self.reads, ['replica'])
+
+    def test_outside_requests_read_primary(self):
+        """Команды и фоновые потоки читают основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            STATIC_ROOT=cls.static_root
+        )
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        """collectstatic пишет имена с хешем и сжатые копии рядом."""
+        self.assertRegex(self.name, r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.static_root, self.name)
+        with open(path, 'rb') as file, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), file.read())
+        self.assertContains(self.client.get(reverse('posts:index')), self.name)
+
+    @skipUnless(storage.brotli, 'brotli не установлен')
+    def test_brotli_siblings(self):
+        """С пакетом brotli рядом появляются и .br копии."""
+        path = os.path.join(self.static_root, self.name)
+        with open(path, 'rb') as file, open(path + '.br', 'rb') as compressed:
+            self.assertEqual(
+                storage.brotli.decompress(compressed.read()), file.read()
+            )
+
+    def test_serves_precompressed_immutable(self):
+        """Клиент с gzip получает сжатую копию с вечным кэшем."""
+        url = f'/static/{self.name}'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(b''.join(plain.streaming_content), body)
+
+    def test_malformed_quality_is_ignored(self):
+        """Кривой q-параметр не ломает ответ, кодировка не выбирается."""
+        url = f'/static/{self.name}'
+        for header in ('gzip;q=.', 'gzip;q=1.2.3', 'gzip; q=x'):
+            with self.subTest(header=header):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='br;q=1.2.3, gzip; q=0.5'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_unhashed_and_missing_files(self):
+        """Файлы без хеша кэшируются ненадолго, чужие пути - мимо."""
+        response = self.client.get('/static/css/bootstrap.min.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+        self.assertEqual(
+            self.client.get('/static/../manage.py').status_code, 404
+        )
+        self.assertEqual(
+            self.client.get('/static/css/missing.css').status_code, 404
+        )
+
+
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='user', password='old-pass'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.other_client = Client()
+        self.client.force_login(self.user)
+        self.other_client.force_login(self.user)
+        self.follow_url = reverse('posts:follow_index')
+
+    def test_session_and_user_served_from_cache(self):
+        """Повторный запрос не читает из БД ни сессию, ни пользователя."""
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Смена пароля сразу выкидывает остальные сессии из кэша."""
+        response = self.other_client.get(self.follow_url)
+        self.assertEqual(response.status_code, 200)
+        self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-pass',
+            'new_password1': 'New-pass-123',
+            'new_password2': 'New-pass-123',
+        })
+        self.assertEqual(self.client.get(self.follow_url).status_code, 200)
+        response = self.other_client.get(self.follow_url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_logout_forgets_user(self):
+        """Выход удаляет пользователя из кэша."""
+        self.client.get(self.follow_url)
+        key = auth.USER_KEY.format(self.user.pk)
+        self.assertIsNotNone(auth.user_cache().get(key))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(auth.user_cache().get(key))
+        self.assertEqual(self.client.get(self.follow_url).status_code, 302)
+
+    def test_deploy_check_requires_shared_cache(self):
+        """С локальным кэшем сессий check --deploy требует общий кэш."""
+        self.assertEqual(
+            [error.id for error in checks.check_user_cache(None)],
+            ['core.E001'],
+        )
+        with override_settings(USER_CACHE_TIMEOUT=0):
+            self.assertEqual(checks.check_user_cache(None), [])
+            url = reverse('about:author')
+            self.client.get(url)
+            self.assertIsNone(
+                auth.user_cache().get(auth.USER_KEY.format(self.user.pk))
+            )
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIR, PROFILE_KEEP=2)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def profiled(self, response):
+        return response.has_header(profiling.ID_HEADER)
+
+    def test_triggers(self):
+        """Профиль снимается по токену, ?profile=1 сотрудника и выборке."""
+        url = reverse('posts:index')
+        self.assertFalse(self.profiled(self.guest_client.get(url)))
+        self.assertFalse(
+            self.profiled(self.user_client.get(url, {'profile': 1}))
+        )
+        self.assertFalse(self.profiled(
+            self.guest_client.get(url, HTTP_X_PROFILE='forged:token')
+        ))
+        self.assertTrue(
+            self.profiled(self.staff_client.get(url, {'profile': 1}))
+        )
+        self.assertTrue(self.profiled(self.guest_client.get(
+            url, HTTP_X_PROFILE=profiling.make_token()
+        )))
+        with override_settings(PROFILE_SAMPLE_RATE=1):
+            self.assertTrue(self.profiled(self.guest_client.get(url)))
+
+    def test_snapshot_has_stats_and_sql_timeline(self):
+        """Снимок хранит pstats и SQL по маршруту, старые вытесняются."""
+        url = reverse('posts:index')
+        for _ in range(3):
+            cache.clear()
+            response = self.staff_client.get(url, {'profile': 1})
+        profiles = profiling.list_profiles()
+        self.assertEqual(list(profiles), ['posts_index'])
+        self.assertEqual(len(profiles['posts_index']), 2)
+        profile_id = response[profiling.ID_HEADER]
+        self.assertEqual(profiles['posts_index'][0]['id'], profile_id)
+        meta, stats = profiling.load('posts_index', profile_id, 10)
+        self.assertEqual(meta['view_name'], 'posts:index')
+        self.assertTrue(meta['queries'])
+        self.assertIn('cumulative', stats)
+
+    def test_staff_pages(self):
+        """Список и разбор профиля видны только сотрудникам."""
+        profile_id = self.staff_client.get(
+            reverse('posts:index'), {'profile': 1}
+        )[profiling.ID_HEADER]
+        detail = reverse('profile_detail', args=['posts_index', profile_id])
+        for url in (reverse('profiles'), detail):
+            with self.subTest(url=url):
+                self.assertEqual(self.user_client.get(url).status_code, 302)
+                self.assertEqual(self.staff_client.get(url).status_code, 200)
+        self.assertContains(self.staff_client.get(detail), 'SELECT')
+        for args in (['..', profile_id], ['posts_index', 'missing']):
+            with self.subTest(args=args):
+                response = self.staff_client.get(
+                    reverse('profile_detail', args=args)
+                )
+                self.assertEqual(response.status_code, 404)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics, profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +12,36 @@ def page_not_found(request, exception):
 
 def permission_denied_view(request, exception):
     return render(request, 'core/403csrf.html', status=403)
+
+
+def metrics_view(request):
+    """Метрики всех воркеров в формате Prometheus, только для локальных IP."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    metrics.flush()
+    return HttpResponse(
+        metrics.render(metrics.merged()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@staff_member_required
+def profiles_view(request):
+    """Снятые профили запросов по маршрутам, от новых к старым."""
+    return render(request, 'core/profiles.html', {
+        'profiles': profiling.list_profiles(),
+    })
+
+
+@staff_member_required
+def profile_detail_view(request, view_name, profile_id):
+    """Самые дорогие функции снимка и хронология его SQL."""
+    try:
+        meta, stats = profiling.load(
+            view_name, profile_id, settings.PROFILE_TOP_FUNCTIONS
+        )
+    except (FileNotFoundError, ValueError):
+        raise Http404
+    return render(request, 'core/profile_detail.html', {
+        'dir_name': view_name, 'meta': meta, 'stats': stats,
+    })
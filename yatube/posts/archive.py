@@ -0,0 +1,138 @@
+"""Архивы постов по месяцам и дням.
+
+Посты периода выбираются диапазоном pub_date >= начало AND pub_date <
+конец, который идёт по индексам лент (pub_date, id), (group, pub_date, id)
+и (author, pub_date, id); __year/__month оборачивают столбец в функцию и
+индекс не используют. Календарь месяцев с числом постов хранится в
+таблице ArchiveMonth по областям кэша лент ('site', 'group:<id>',
+'author:<id>'), её правят сигналы создания и удаления постов, так что
+навигация по архиву читает только эту таблицу.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.apps import apps as global_apps
+from django.db.models import Count, DateField, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import cache as feed_cache
+from .models import ArchiveMonth, Post
+
+
+def post_scopes(author_id, group_id):
+    scopes = [feed_cache.SITE_SCOPE, feed_cache.author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(feed_cache.group_scope(group_id))
+    return scopes
+
+
+def post_month(post):
+    return timezone.localtime(post.pub_date).date().replace(day=1)
+
+
+def _change(scopes, month, delta):
+    if delta > 0:
+        ArchiveMonth.objects.bulk_create(
+            [ArchiveMonth(scope=scope, month=month) for scope in scopes],
+            ignore_conflicts=True,
+        )
+    rows = ArchiveMonth.objects.filter(scope__in=scopes, month=month)
+    rows.update(post_count=F('post_count') + delta)
+    if delta < 0:
+        rows.filter(post_count__lte=0).delete()
+
+
+def post_added(post):
+    _change(post_scopes(post.author_id, post.group_id), post_month(post), 1)
+
+
+def post_removed(post):
+    _change(post_scopes(post.author_id, post.group_id), post_month(post), -1)
+
+
+def post_moved(post, old_group_id):
+    """Пост перенесён в другую группу при правке."""
+    month = post_month(post)
+    if old_group_id is not None:
+        _change([feed_cache.group_scope(old_group_id)], month, -1)
+    if post.group_id is not None:
+        _change([feed_cache.group_scope(post.group_id)], month, 1)
+
+
+def add_posts(post_ids):
+    """Добавляет в календарь посты, загруженные в обход сигналов."""
+    totals = Counter()
+    posts = Post.objects.filter(pk__in=post_ids).values_list(
+        'author_id', 'group_id', 'pub_date'
+    )
+    for author_id, group_id, pub_date in posts.iterator():
+        month = timezone.localtime(pub_date).date().replace(day=1)
+        for scope in post_scopes(author_id, group_id):
+            totals[scope, month] += 1
+    for (scope, month), total in totals.items():
+        _change([scope], month, total)
+
+
+def group_removed(group_id):
+    # Посты уходят из удалённой группы UPDATE-ом, без сигналов.
+    ArchiveMonth.objects.filter(
+        scope=feed_cache.group_scope(group_id)
+    ).delete()
+
+
+def rebuild(apps=global_apps):
+    """Собирает календарь заново по всем постам; возвращает число строк."""
+    Post = apps.get_model('posts', 'Post')
+    ArchiveMonth = apps.get_model('posts', 'ArchiveMonth')
+    posts = Post.objects.annotate(
+        month=TruncMonth('pub_date', output_field=DateField())
+    ).order_by()
+    sources = (
+        (None, lambda value: feed_cache.SITE_SCOPE),
+        ('author_id', feed_cache.author_scope),
+        ('group_id', feed_cache.group_scope),
+    )
+    rows = []
+    for field, scope in sources:
+        fields = ('month',) if field is None else ('month', field)
+        queryset = posts.values(*fields).annotate(total=Count('id'))
+        if field == 'group_id':
+            queryset = queryset.filter(group_id__isnull=False)
+        for row in queryset.iterator():
+            rows.append(ArchiveMonth(
+                scope=scope(row.get(field)), month=row['month'],
+                post_count=row['total'],
+            ))
+    ArchiveMonth.objects.all().delete()
+    ArchiveMonth.objects.bulk_create(rows)
+    return len(rows)
+
+
+def months(scope):
+    """Месяцы области с постами, от новых к старым: [(month, count)]."""
+    return feed_cache.get_or_build(
+        [scope], ('archive-months',),
+        lambda: list(ArchiveMonth.objects.filter(scope=scope).order_by(
+            '-month'
+        ).values_list('month', 'post_count')),
+    )
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def period_bounds(year, month, day=None):
+    """Начало, конец (не включая) и первый день периода.
+
+    ValueError - такой даты нет, OverflowError - число вне диапазона
+    дат (например, день после 31.12.9999).
+    """
+    if day is None:
+        first = date(year, month, 1)
+        last = date(year + month // 12, month % 12 + 1, 1)
+    else:
+        first = date(year, month, day)
+        last = first + timedelta(days=1)
+    return _aware(first), _aware(last), first
@@ -0,0 +1,105 @@
+"""Кэш лент с версиями (поколениями) по областям данных.
+
+Каждая область - весь сайт, группа, автор, пост - хранит в кэше счётчик
+поколения. Ключ закэшированной страницы включает текущие поколения всех
+областей, от которых она зависит, поэтому сигнал, увеличивший счётчик,
+мгновенно делает старые записи недостижимыми. Благодаря этому TTL может
+быть долгим: страница живёт ровно до изменения своих данных.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics, routers
+
+GENERATION_KEY = 'generation:{}'
+# Меняется при правке групп и пользователей, которые видны в любой ленте.
+META_SCOPE = 'meta'
+SITE_SCOPE = 'site'
+# Вкладка "Популярное", сбрасывается после пересчёта рейтинга.
+TRENDING_SCOPE = 'trending'
+# Каталог групп со статистикой, сбрасывается записью любого поста.
+GROUPS_SCOPE = 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _initial_generation():
+    # Если счётчик вытеснен из кэша, новое значение не должно совпасть
+    # ни с одним из старых, поэтому стартуем с текущего времени.
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump(*scopes):
+    """Инвалидирует все страницы, зависящие от перечисленных областей."""
+    for scope in set(scopes):
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def bump_post(post_id, author_id, *group_ids):
+    """Сбрасывает все ленты, в которых виден пост."""
+    bump(
+        SITE_SCOPE,
+        author_scope(author_id),
+        post_scope(post_id),
+        *(group_scope(group_id) for group_id in group_ids
+          if group_id is not None),
+    )
+
+
+def cache_key(scopes, *parts):
+    raw = ':'.join(str(part) for part in (*get_generations(scopes), *parts))
+    return 'feed:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def lookup(scopes, parts):
+    """Ключ для текущих поколений и значение по нему (None - промах)."""
+    key = cache_key((META_SCOPE, *scopes), *parts)
+    value = cache.get(key)
+    metrics.record_cache(value is not None)
+    return key, value
+
+
+def store(key, value):
+    # Отстающая реплика могла не увидеть запись, уже сбросившую поколение:
+    # такая страница живёт не дольше окна, за которое реплика догоняет.
+    timeout = (
+        settings.FEED_CACHE_TIMEOUT if routers.reads_primary()
+        else settings.REPLICA_PIN_SECONDS
+    )
+    cache.set(key, value, timeout)
+
+
+def get_or_build(scopes, parts, build):
+    """Значение из кэша для текущих поколений или результат build()."""
+    key, value = lookup(scopes, parts)
+    if value is None:
+        value = build()
+        store(key, value)
+    return value
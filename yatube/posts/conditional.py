@@ -0,0 +1,68 @@
+"""Условные GET-запросы (ETag) для лент и страницы поста.
+
+Валидатор страницы собирается до рендера шаблона из дешёвых данных:
+поколений кэша её областей (они меняются при любой правке, см. cache.py)
+и позиции самой свежей записи, которую отдаёт индекс ленты. Сама позиция
+кэшируется под теми же поколениями, так что при тёплом кэше проверка
+If-None-Match не ходит в БД вовсе.
+
+Страница показывает имя вошедшего пользователя, поэтому его id входит в
+ETag, ответ помечается Vary: Cookie и для авторизованных - private.
+
+Last-Modified не отправляется: дату, которая растёт при каждой правке
+страницы, из этих данных не получить - удаление поста, правка имени
+автора или новая подписка не оставляют свежей отметки времени, и
+If-Modified-Since отдавал бы устаревшие 304.
+"""
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+
+from . import cache as feed_cache
+
+
+def latest_position(queryset, key=('pub_date', 'id')):
+    """Ключ самой свежей записи по индексу ленты или пустой кортеж."""
+    return queryset.order_by(
+        *(f'-{field}' for field in key)
+    ).values_list(*key).first() or ()
+
+
+def get_etag(request, scopes, aggregates, personal=True):
+    """ETag страницы.
+
+    aggregates() возвращает кортеж позиций самых свежих записей, от которых
+    зависит страница. personal=False - ответ одинаков для всех
+    пользователей.
+    """
+    values = feed_cache.get_or_build(
+        scopes, ('validators', request.path), aggregates
+    )
+    generations = feed_cache.get_generations(
+        (feed_cache.META_SCOPE, *scopes)
+    )
+    raw = ':'.join(str(part) for part in (
+        *generations, *values, request.get_full_path(),
+        request.user.pk if personal else None,
+    ))
+    # Слабый: в форме у авторизованных каждый раз новая маска CSRF-токена.
+    return 'W/"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_render(request, etag, render_page, personal=True):
+    """304 на совпавший ETag, иначе результат render_page()."""
+    if request.method not in ('GET', 'HEAD'):
+        return render_page()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render_page()
+    response['ETag'] = etag
+    # Браузер не должен отдавать ленту из кэша без перепроверки.
+    patch_cache_control(response, no_cache=True)
+    if personal:
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Cookie',))
+    return response
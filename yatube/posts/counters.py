@@ -0,0 +1,143 @@
+"""Денормализованные счётчики комментариев, постов и подписок.
+
+Счётчики меняются одним UPDATE с F()-выражением, поэтому конкурентные
+запросы не теряют инкременты. Если значения всё же разошлись с данными,
+их пересчитывает команда ``manage.py recount_stats``.
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, UserStats
+
+
+def _shifted(field, delta):
+    # Разошедшийся счётчик может уже быть нулём: уход ниже нуля нарушил бы
+    # CHECK у PositiveIntegerField и сорвал удаление.
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def _change(user_id, **deltas):
+    updates = {
+        field: _shifted(field, delta) for field, delta in deltas.items()
+    }
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    # Строку создаём только на рост: уменьшение без строки бывает при
+    # каскадном удалении самого пользователя.
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def get_stats(user):
+    """Счётчики пользователя; у новых пользователей строки ещё нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def post_added(post):
+    _change(post.author_id, post_count=1)
+
+
+def post_removed(post):
+    _change(post.author_id, post_count=-1)
+
+
+def comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=_shifted('comment_count', 1)
+    )
+
+
+def comment_removed(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=_shifted('comment_count', -1)
+    )
+
+
+def follow_added(follow):
+    _change(follow.user_id, following_count=1)
+    _change(follow.author_id, follower_count=1)
+
+
+def follow_removed(follow):
+    _change(follow.user_id, following_count=-1)
+    _change(follow.author_id, follower_count=-1)
+
+
+def _count(model, field):
+    """Подзапрос COUNT(*) строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def recount(apps=global_apps, batch_size=1000, user_ids=None,
+            post_ids=None):
+    """Пересчитывает счётчики набором UPDATE; возвращает число
+    исправленных строк по каждой таблице.
+
+    user_ids и post_ids ограничивают пересчёт этими пользователями и
+    постами (None - все).
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    users = User.objects.all()
+    stats = UserStats.objects.all()
+    posts = Post.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+
+    missing = users.filter(stats__isnull=True).values_list('pk', flat=True)
+    # batch_size в bulk_create не передаём: Django сам режет пачку под
+    # лимит параметров SQLite, а здесь ограничиваем только память.
+    batch = []
+    for pk in missing.iterator():
+        batch.append(UserStats(user_id=pk))
+        if len(batch) >= batch_size:
+            UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+
+    comment_count = _count(Comment, 'post')
+    posts_fixed = posts.annotate(actual=comment_count).exclude(
+        comment_count=F('actual')
+    ).update(comment_count=comment_count)
+
+    post_count = _count(Post, 'author')
+    follower_count = _count(Follow, 'author')
+    following_count = _count(Follow, 'user')
+    # В подзапросах OuterRef('pk') указывает на пользователя, чей pk
+    # совпадает с pk строки статистики (OneToOne с primary_key=True).
+    stats_fixed = stats.annotate(
+        actual_posts=post_count,
+        actual_followers=follower_count,
+        actual_following=following_count,
+    ).exclude(
+        Q(post_count=F('actual_posts'))
+        & Q(follower_count=F('actual_followers'))
+        & Q(following_count=F('actual_following'))
+    ).update(
+        post_count=post_count,
+        follower_count=follower_count,
+        following_count=following_count,
+    )
+    return {'posts': posts_fixed, 'stats': stats_fixed}
@@ -0,0 +1,152 @@
+"""Atom-ленты сайта, групп и авторов.
+
+Лента собирается потоком: StreamingHttpResponse отдаёт XML по записи,
+пока .iterator() читает посты из БД, так что ни queryset, ни документ
+целиком в памяти не держатся. Готовый документ одновременно копится и
+кладётся в кэш лент под поколения своей области - одна запись на ленту,
+общая для всех читателей; следующие запросы отдают её без БД, а
+опросы с If-None-Match получают 304.
+
+<updated> записей и документа берётся из Post.updated (миграция 0014),
+иначе читатели лент не видели бы правок постов.
+"""
+from io import StringIO
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import get_tag_uri, rfc3339_date
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from . import cache as feed_cache
+from .conditional import conditional_render, get_etag, latest_position
+from .models import Group, Post, User
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+CONTENT_TYPE = 'application/atom+xml; charset=utf-8'
+
+
+def _entry(handler, request, post):
+    url = request.build_absolute_uri(
+        reverse('posts:post_detail', kwargs={'post_id': post.id})
+    )
+    handler.startElement('entry', {})
+    handler.addQuickElement(
+        'title', Truncator(post.text).words(8, truncate='…')
+    )
+    handler.addQuickElement(
+        'link', '', {'href': url, 'rel': 'alternate'}
+    )
+    handler.addQuickElement('id', get_tag_uri(url, post.pub_date))
+    handler.addQuickElement('published', rfc3339_date(post.pub_date))
+    handler.addQuickElement('updated', rfc3339_date(post.updated))
+    handler.startElement('author', {})
+    handler.addQuickElement(
+        'name', post.author.get_full_name() or post.author.username
+    )
+    handler.endElement('author')
+    if post.group_id:
+        handler.addQuickElement(
+            'category', '', {'term': post.group.slug,
+                             'label': post.group.title}
+        )
+    handler.addQuickElement('content', post.text, {'type': 'text'})
+    handler.endElement('entry')
+
+
+def generate(request, title, html_url, queryset):
+    """Куски Atom-документа по мере чтения постов."""
+    posts = queryset.order_by('-pub_date', '-id')[:settings.FEED_ITEMS]
+    # Документ меняется вместе с самой свежей правкой его записей.
+    updated = max(
+        posts.values_list('updated', flat=True), default=None
+    ) or timezone.now()
+    buffer = StringIO()
+    handler = SimplerXMLGenerator(buffer, 'utf-8')
+
+    def drain():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk.encode()
+
+    # Лента без параметров: строка запроса в документ не попадает.
+    url = request.build_absolute_uri(request.path)
+    handler.startDocument()
+    handler.startElement('feed', {'xmlns': ATOM_NS, 'xml:lang': 'ru'})
+    handler.addQuickElement('title', title)
+    handler.addQuickElement('link', '', {'href': url, 'rel': 'self'})
+    handler.addQuickElement('link', '', {
+        'href': request.build_absolute_uri(html_url), 'rel': 'alternate',
+    })
+    handler.addQuickElement('id', url)
+    handler.addQuickElement('updated', rfc3339_date(updated))
+    yield drain()
+    for post in posts.iterator():
+        _entry(handler, request, post)
+        yield drain()
+    handler.endElement('feed')
+    yield drain()
+
+
+def _caching(chunks, key):
+    """Пропускает куски дальше и кладёт документ в кэш, когда он готов."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    feed_cache.store(key, b''.join(parts))
+
+
+def feed_response(request, title, html_url, queryset, scopes):
+    queryset = queryset.for_feed()
+    etag = get_etag(
+        request, scopes, lambda: latest_position(queryset), personal=False
+    )
+
+    def render_feed():
+        # Ссылки в документе абсолютные, поэтому хост - часть ключа;
+        # строку запроса не берём, чтобы мусорные параметры не плодили
+        # записи в кэше.
+        key, document = feed_cache.lookup(
+            scopes,
+            ('atom', request.scheme, request.get_host(), request.path),
+        )
+        if document is not None:
+            return HttpResponse(document, content_type=CONTENT_TYPE)
+        return StreamingHttpResponse(
+            _caching(generate(request, title, html_url, queryset), key),
+            content_type=CONTENT_TYPE,
+        )
+
+    return conditional_render(
+        request, etag, render_feed, personal=False
+    )
+
+
+def site_feed(request):
+    return feed_response(
+        request, 'Yatube: последние записи', reverse('posts:index'),
+        Post.objects.all(), [feed_cache.SITE_SCOPE],
+    )
+
+
+def group_feed(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, f'Yatube: {group.title}',
+        reverse('posts:group_list', kwargs={'slug': slug}),
+        group.posts.all(), [feed_cache.group_scope(group.id)],
+    )
+
+
+def profile_feed(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, f'Yatube: {author.get_full_name() or author.username}',
+        reverse('posts:profile', kwargs={'username': username}),
+        author.posts.all(), [feed_cache.author_scope(author.id)],
+    )
@@ -0,0 +1,69 @@
+"""Кэш подписок: отсортированный массив id авторов на пользователя.
+
+Массив лежит в кэше данных пользователя (там же, где сессии) как байты
+array('q'): проверка "подписан ли A на B" - двоичный поиск, а "на кого
+подписан A" - готовый список, оба без запросов к БД. Сигналы Follow
+не правят массив на месте (параллельные подписки теряли бы друг друга,
+а откат транзакции оставлял бы в кэше несуществующую подписку), а
+удаляют его: сразу и ещё раз после коммита, чтобы убрать массив,
+который параллельный запрос успел прочитать из БД до коммита. Следующее
+чтение загрузит массив одним запросом.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from core.auth import user_cache
+
+from .models import Follow
+
+FOLLOWS_KEY = 'follows:{}'
+TYPECODE = 'q'
+
+
+def _store(user_id, ids):
+    user_cache().set(
+        FOLLOWS_KEY.format(user_id), ids.tobytes(),
+        settings.FOLLOW_CACHE_TIMEOUT,
+    )
+
+
+def _cached(user_id):
+    raw = user_cache().get(FOLLOWS_KEY.format(user_id))
+    if raw is None:
+        return None
+    ids = array(TYPECODE)
+    ids.frombytes(raw)
+    return ids
+
+
+def following_ids(user_id):
+    """Отсортированный массив id авторов, на которых подписан пользователь."""
+    ids = _cached(user_id)
+    if ids is None:
+        ids = array(TYPECODE, Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True))
+        _store(user_id, ids)
+    return ids
+
+
+def is_following(user_id, author_id):
+    ids = following_ids(user_id)
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def changed(user_id):
+    """Подписки пользователя изменились в текущей транзакции."""
+    forget(user_id)
+    transaction.on_commit(lambda: forget(user_id))
+
+
+def forget(*user_ids):
+    """Сбрасывает массивы после записи подписок в обход сигналов."""
+    user_cache().delete_many(
+        [FOLLOWS_KEY.format(user_id) for user_id in user_ids]
+    )
@@ -0,0 +1,111 @@
+"""Фоновая нарезка уменьшенных копий картинок постов.
+
+Загрузка картинки только ставит задачу в локальный пул потоков, так что
+запрос не ждёт обработки. Задача делает копии нескольких ширин в WebP и
+JPEG и записывает их список в Post.image_variants; до этого шаблоны
+показывают оригинал.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import cache as feed_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'posts/variants'
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def schedule_variants(post):
+    """Ставит нарезку в очередь после коммита, когда файл уже сохранён."""
+    post_id, image_name = post.id, post.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(run_variants, post_id, image_name)
+    )
+
+
+def run_variants(post_id, image_name):
+    try:
+        generate_variants(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось нарезать картинку поста %s', post_id)
+    finally:
+        # У каждого потока пула своё соединение с БД.
+        connection.close()
+
+
+def _widths(original_width):
+    widths = [
+        width for width in sorted(settings.IMAGE_VARIANT_WIDTHS)
+        if width < original_width
+    ]
+    # Не увеличиваем: вместо больших ширин - копия в исходном размере.
+    if len(widths) < len(settings.IMAGE_VARIANT_WIDTHS):
+        widths.append(original_width)
+    return widths
+
+
+def _encode(image, image_format):
+    if image_format == 'jpeg':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, PIL_FORMATS[image_format],
+        quality=settings.IMAGE_VARIANT_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def generate_variants(post_id, image_name):
+    """Нарезает копии и сохраняет их список, если картинка не сменилась."""
+    with default_storage.open(image_name) as source:
+        original = Image.open(source)
+        has_alpha = (
+            'A' in original.getbands() or 'transparency' in original.info
+        )
+        # Палитровые GIF/PNG масштабируются только в полноцветном режиме.
+        original = original.convert('RGBA' if has_alpha else 'RGB')
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = []
+    for image_format in settings.IMAGE_VARIANT_FORMATS:
+        for width in _widths(original.width):
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            name = default_storage.save(
+                f'{VARIANTS_DIR}/{stem}-{width}.{image_format}',
+                ContentFile(_encode(resized, image_format)),
+            )
+            variants.append(
+                {'width': width, 'format': image_format, 'name': name}
+            )
+    # Пока шла нарезка, автор мог загрузить другую картинку.
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        image_variants=json.dumps(variants), updated=timezone.now()
+    )
+    if updated:
+        post = Post.objects.values('author_id', 'group_id').get(pk=post_id)
+        feed_cache.bump_post(post_id, post['author_id'], post['group_id'])
+    return variants
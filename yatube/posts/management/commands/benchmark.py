@@ -0,0 +1,190 @@
+import json
+import math
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.pagination import encode_cursor
+from posts.seed import seed
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+def percentile(values, fraction):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и размер ответа views '
+        'приложения posts на наполненной тестовой базе и сравнивает '
+        'результат с сохранённым эталоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не сбрасывать кэш между прогонами.',
+        )
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--threshold', type=float, default=0.5,
+            help='Допустимый рост p95 и размера ответа (0.5 = +50%%).',
+        )
+        parser.add_argument(
+            '--write-baseline', action='store_true',
+            help='Сохранить результат как новый эталон.',
+        )
+
+    def handle(self, *args, **options):
+        # Как и тестовый раннер, меряем без DEBUG и debug toolbar.
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            seed(
+                users=options['users'], posts=options['posts'],
+                comments=options['comments'],
+            )
+            report = {
+                'config': {
+                    key: options[key]
+                    for key in ('iterations', 'users', 'posts', 'comments',
+                                'warm')
+                },
+                'views': self.run_scenarios(options),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        if options['write_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+                file.write('\n')
+            return
+        regressions = self.compare(report, options)
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно эталона:\n' + '\n'.join(regressions)
+            )
+
+    def scenarios(self):
+        """Сценарии (имя, URL, пользователь) на самых тяжёлых данных."""
+        group = Group.objects.annotate(total=Count('posts')).latest('total')
+        author = User.objects.annotate(total=Count('posts')).latest('total')
+        post = Post.objects.latest('comment_count')
+        reader = User.objects.annotate(total=Count('follower')).latest('total')
+        deep = Post.objects.order_by('pub_date', 'id')[10]
+        return (
+            ('index', reverse('posts:index'), None),
+            (
+                'index_deep',
+                reverse('posts:index')
+                + f'?after={encode_cursor((deep.pub_date, deep.id))}',
+                None,
+            ),
+            (
+                'group_posts',
+                reverse('posts:group_list', kwargs={'slug': group.slug}),
+                None,
+            ),
+            (
+                'profile',
+                reverse('posts:profile', kwargs={'username': author.username}),
+                None,
+            ),
+            (
+                'post_detail',
+                reverse('posts:post_detail', kwargs={'post_id': post.id}),
+                None,
+            ),
+            ('follow_index', reverse('posts:follow_index'), reader),
+            # Вошедший читатель: сессия и пользователь приходят из кэша.
+            ('index_authenticated', reverse('posts:index'), reader),
+            (
+                'profile_authenticated',
+                reverse('posts:profile', kwargs={'username': author.username}),
+                reader,
+            ),
+        )
+
+    def run_scenarios(self, options):
+        results = {}
+        for name, url, user in self.scenarios():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            # Прогрев: у живого клиента сессия и пользователь уже в кэше
+            # сессий, его cache.clear() ниже не трогает.
+            client.get(url)
+            timings, queries, sizes = [], [], []
+            for _ in range(options['iterations']):
+                if not options['warm']:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{name}: {url} вернул {response.status_code}'
+                    )
+                queries.append(len(captured))
+                sizes.append(len(response.content))
+            results[name] = {
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'p99_ms': round(percentile(timings, 0.99), 2),
+                'queries': max(queries),
+                'bytes': max(sizes),
+            }
+        return results
+
+    def compare(self, report, options):
+        if not os.path.exists(options['baseline']):
+            raise CommandError(
+                f'Нет эталона {options["baseline"]}; '
+                'создайте его с --write-baseline.'
+            )
+        with open(options['baseline']) as file:
+            baseline = json.load(file)['views']
+        limit = 1 + options['threshold']
+        regressions = []
+        for name, current in report['views'].items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if current['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: запросов {current["queries"]} '
+                    f'> {expected["queries"]}'
+                )
+            for metric in ('p95_ms', 'bytes'):
+                if current[metric] > expected[metric] * limit:
+                    regressions.append(
+                        f'{name}: {metric} {current[metric]} '
+                        f'> {expected[metric]} × {limit:g}'
+                    )
+        return regressions
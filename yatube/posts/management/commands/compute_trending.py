@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import compute
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг вкладки "Популярное" по комментариям и '
+        'постам, появившимся с прошлого запуска. Запускайте по расписанию.'
+    )
+
+    def handle(self, *args, **options):
+        changed = compute()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено: {changed["updated"]}, '
+            f'добавлено: {changed["created"]}, '
+            f'удалено: {changed["removed"]}'
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import dumps, export_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в JSONL, читая таблицы потоком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл дампа; по умолчанию stdout.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = {}
+        if options['output'] == '-':
+            output = self.stdout
+        else:
+            output = open(options['output'], 'w', encoding='utf-8')
+        try:
+            for row in export_rows(options['chunk_size']):
+                output.write(dumps(row) + '\n')
+                counts[row['model']] = counts.get(row['model'], 0) + 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        # Отчёт в stderr, чтобы не смешиваться с дампом в stdout.
+        summary = ', '.join(
+            f'{model}: {count}' for model, count in counts.items()
+        )
+        self.stderr.write(
+            f'Выгружено {total} строк ({summary}) за {elapsed:.2f} с, '
+            f'{total / elapsed if elapsed else 0:.0f} строк/с'
+        )
@@ -0,0 +1,62 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import Importer, rebuild_derived
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает JSONL-дамп export_content пачками bulk_create, '
+        'сопоставляя пользователей по username и группы по slug, затем '
+        'дополняет счётчики, ленты подписок и поисковый индекс '
+        'загруженными записями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл дампа; по умолчанию stdin.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одной транзакции.',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Перестроить производные данные по всей базе, а не только '
+                 'по загруженным записям.',
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(batch_size=options['batch_size'])
+        started = time.perf_counter()
+        if options['input'] == '-':
+            source = sys.stdin
+        else:
+            source = open(options['input'], encoding='utf-8')
+        try:
+            importer.load(source)
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Некорректный дамп: {error!r}')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        loaded = time.perf_counter() - started
+        if options['rebuild']:
+            rebuild_derived()
+        else:
+            importer.update_derived()
+        elapsed = time.perf_counter() - started
+        rows = sum(importer.created.values()) + sum(importer.skipped.values())
+        for model, created in importer.created.items():
+            self.stdout.write(
+                f'{model}: создано {created}, '
+                f'пропущено {importer.skipped[model]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {rows} строк за {loaded:.2f} с '
+            f'({rows / loaded if loaded else 0:.0f} строк/с), '
+            f'с пересчётом производных данных - {elapsed:.2f} с'
+        ))
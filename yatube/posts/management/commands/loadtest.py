@@ -0,0 +1,456 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from posts.management.commands.benchmark import percentile
+from posts.models import Group, Post, User
+from posts.seed import SEED_PREFIX, seed
+
+PASSWORD = 'loadtest-password'
+LOCKED_MESSAGE = 'database is locked'
+# Читатели на index/follow_index против писателей на post_create,
+# add_comment и profile_follow.
+DEFAULT_MIX = (
+    'index=30,follow_index=20,post_detail=15,profile=10,'
+    'post_create=5,add_comment=12,profile_follow=4,profile_unfollow=4'
+)
+
+_local = threading.local()
+
+
+def _remember_exception(sender, **kwargs):
+    # Django 2.2 не передаёт исключение в сигнал, но обработчик
+    # вызывается внутри except - берём его из sys.exc_info().
+    _local.exception = sys.exc_info()[1]
+
+
+def is_locked(exception):
+    return (isinstance(exception, OperationalError)
+            and LOCKED_MESSAGE in str(exception))
+
+
+def parse_mix(value):
+    """'index=3,post_create=1' -> {'index': 3.0, 'post_create': 1.0}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise CommandError(
+                f'Неизвестный сценарий {name!r}; есть: {", ".join(SCENARIOS)}'
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Вес сценария {name} - не число: {weight!r}')
+        if mix[name] < 0:
+            raise CommandError(f'Вес сценария {name} меньше нуля')
+    if not any(mix.values()):
+        raise CommandError('Все веса сценариев нулевые')
+    return mix
+
+
+class VirtualUser:
+    """Клиент, который вызывает WSGI-приложение напрямую.
+
+    Хранит cookies между запросами (сессия, csrftoken) и подставляет
+    CSRF-токен в POST-формы, как это делает браузер.
+    """
+
+    def __init__(self, application, multiprocess=False):
+        self.application = application
+        self.multiprocess = multiprocess
+        self.cookies = {}
+
+    def environ(self, method, path, data):
+        url = urlsplit(path)
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': not self.multiprocess,
+            'wsgi.multiprocess': self.multiprocess,
+            'wsgi.run_once': False,
+        }
+        if method == 'POST':
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+            environ['CONTENT_LENGTH'] = str(len(body))
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        return environ
+
+    def request(self, method, path, data=None):
+        """(статус, тело, исключение внутри Django или None)."""
+        if method == 'POST':
+            data = {
+                **(data or {}),
+                'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''),
+            }
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        _local.exception = None
+        result = self.application(self.environ(method, path, data),
+                                  start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            # close() шлёт request_finished: Django закрывает соединение.
+            if hasattr(result, 'close'):
+                result.close()
+        for name, value in response['headers']:
+            if name.lower() == 'set-cookie':
+                self.store_cookie(value)
+        return response['status'], body, _local.exception
+
+    def store_cookie(self, header):
+        cookie = SimpleCookie()
+        cookie.load(header)
+        for name, morsel in cookie.items():
+            if morsel.value and morsel['max-age'] not in ('0', 0):
+                self.cookies[name] = morsel.value
+            else:
+                self.cookies.pop(name, None)
+
+    def login(self, username, password):
+        url = reverse('users:login')
+        self.request('GET', url)
+        status, _, _ = self.request(
+            'POST', url, {'username': username, 'password': password}
+        )
+        if status != 302 or 'sessionid' not in self.cookies:
+            raise RuntimeError(f'Не удалось войти как {username}')
+
+
+def _index(rng, data):
+    return 'GET', reverse('posts:index'), None
+
+
+def _follow_index(rng, data):
+    return 'GET', reverse('posts:follow_index'), None
+
+
+def _post_detail(rng, data):
+    return 'GET', reverse(
+        'posts:post_detail', kwargs={'post_id': rng.choice(data['posts'])}
+    ), None
+
+
+def _profile(rng, data):
+    return 'GET', reverse(
+        'posts:profile', kwargs={'username': rng.choice(data['usernames'])}
+    ), None
+
+
+def _post_create(rng, data):
+    return 'POST', reverse('posts:post_create'), {
+        'text': f'Нагрузочный пост {rng.random()}',
+        'group': rng.choice(data['groups'] + ['']),
+    }
+
+
+def _add_comment(rng, data):
+    return 'POST', reverse(
+        'posts:add_comment', kwargs={'post_id': rng.choice(data['posts'])}
+    ), {'text': f'Нагрузочный комментарий {rng.random()}'}
+
+
+def _profile_follow(rng, data):
+    return 'GET', reverse(
+        'posts:profile_follow',
+        kwargs={'username': rng.choice(data['usernames'])},
+    ), None
+
+
+def _profile_unfollow(rng, data):
+    return 'GET', reverse(
+        'posts:profile_unfollow',
+        kwargs={'username': rng.choice(data['usernames'])},
+    ), None
+
+
+SCENARIOS = {
+    'index': _index,
+    'follow_index': _follow_index,
+    'post_detail': _post_detail,
+    'profile': _profile,
+    'post_create': _post_create,
+    'add_comment': _add_comment,
+    'profile_follow': _profile_follow,
+    'profile_unfollow': _profile_unfollow,
+}
+
+
+def _new_result():
+    return {'latencies': [], 'errors': 0, 'locked': 0, 'retries': 0}
+
+
+def run_worker(worker):
+    """Один виртуальный пользователь: вход, ожидание старта, сценарии
+    до дедлайна. Возвращает сырые замеры по сценариям."""
+    from yatube.wsgi import application
+
+    # Ошибки считаем сами, а не печатаем по трейсбеку на каждую.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    rng = random.Random(worker['seed'])
+    user = VirtualUser(application, multiprocess=worker['multiprocess'])
+    user.login(worker['username'], PASSWORD)
+    names = list(worker['mix'])
+    weights = [worker['mix'][name] for name in names]
+    results = defaultdict(_new_result)
+    time.sleep(max(0, worker['start_at'] - time.time()))
+    while time.time() < worker['deadline']:
+        name = rng.choices(names, weights)[0]
+        method, path, data = SCENARIOS[name](rng, worker['data'])
+        result = results[name]
+        started = time.perf_counter()
+        for attempt in range(worker['retries'] + 1):
+            status, _, exception = user.request(method, path, data)
+            if not is_locked(exception):
+                break
+            result['locked'] += 1
+            if attempt < worker['retries']:
+                result['retries'] += 1
+                time.sleep(worker['backoff'] * 2 ** attempt)
+        # Задержка с повторами - столько ждал бы пользователь.
+        result['latencies'].append(time.perf_counter() - started)
+        if status >= 400:
+            result['errors'] += 1
+    return dict(results)
+
+
+def summarize(worker_results, elapsed):
+    """Сводка по сценариям и итог по всем запросам."""
+    merged = defaultdict(_new_result)
+    for results in worker_results:
+        for name, result in results.items():
+            target = merged[name]
+            target['latencies'].extend(result['latencies'])
+            for key in ('errors', 'locked', 'retries'):
+                target[key] += result[key]
+    total = _new_result()
+    for result in merged.values():
+        total['latencies'].extend(result['latencies'])
+        for key in ('errors', 'locked', 'retries'):
+            total[key] += result[key]
+
+    def row(result):
+        latencies = result['latencies']
+        if not latencies:
+            return None
+        return {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'errors': result['errors'],
+            'locked': result['locked'],
+            'retries': result['retries'],
+        }
+
+    endpoints = {
+        name: row(result) for name, result in sorted(merged.items())
+        if result['latencies']
+    }
+    return {'endpoints': endpoints, 'total': row(total)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает yatube.wsgi.application из пула потоков или процессов '
+        'смесью сценариев чтения и записи на файловой тестовой базе SQLite '
+        'и печатает пропускную способность, перцентили задержки, ошибки '
+        '"database is locked" и повторы по каждому сценарию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--mode', choices=('thread', 'process'), default='thread',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность нагрузки в секундах.',
+        )
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help='Веса сценариев: имя=вес через запятую.',
+        )
+        parser.add_argument(
+            '--retries', type=int, default=3,
+            help='Повторов запроса после "database is locked".',
+        )
+        parser.add_argument(
+            '--backoff', type=float, default=0.05,
+            help='Пауза перед первым повтором, далее удваивается.',
+        )
+        parser.add_argument(
+            '--busy-timeout', type=float, default=None,
+            help='Сколько секунд SQLite ждёт снятия блокировки '
+                 '(по умолчанию - как у драйвера, 5).',
+        )
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--json', action='store_true', help='Печатать отчёт в JSON.',
+        )
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['workers'] < 1:
+            raise CommandError('Нужен хотя бы один воркер')
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда рассчитана на SQLite')
+        if (options['mode'] == 'process'
+                and 'fork' not in multiprocessing.get_all_start_methods()):
+            raise CommandError('Режим process требует fork')
+        setup_test_environment(debug=False)
+        # В памяти база видна только своему соединению, а потокам и
+        # процессам нужна общая - поэтому тестовая база в файле.
+        directory = tempfile.mkdtemp()
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings.get('NAME')
+        test_settings['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+        old_options = dict(connection.settings_dict['OPTIONS'])
+        if options['busy_timeout'] is not None:
+            connection.settings_dict['OPTIONS']['timeout'] = (
+                options['busy_timeout']
+            )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        # Только на время нагрузки: процессы-воркеры наследуют обработчик
+        # через fork, а остальной код проекта его не видит.
+        got_request_exception.connect(_remember_exception)
+        try:
+            report = self.run_load(options, mix)
+        finally:
+            got_request_exception.disconnect(_remember_exception)
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            connection.settings_dict['OPTIONS'] = old_options
+            shutil.rmtree(directory, ignore_errors=True)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            self.print_report(report)
+
+    def prepare(self, options):
+        """Наполняет базу и возвращает данные для сценариев."""
+        seed(
+            users=options['users'], posts=options['posts'],
+            comments=options['comments'], random_seed=options['seed'],
+        )
+        seeded = User.objects.filter(username__startswith=SEED_PREFIX)
+        # Один хеш на всех: PBKDF2 на каждого заметно тормозит подготовку.
+        seeded.update(password=make_password(PASSWORD))
+        return {
+            'usernames': list(seeded.values_list('username', flat=True)),
+            'posts': list(Post.objects.values_list('id', flat=True)),
+            'groups': [
+                str(pk) for pk in Group.objects.values_list('id', flat=True)
+            ],
+        }
+
+    def run_load(self, options, mix):
+        data = self.prepare(options)
+        multiprocess = options['mode'] == 'process'
+        # Вход всех пользователей не входит в замер: старт по общим часам.
+        start_at = time.time() + 1 + 0.05 * options['workers']
+        deadline = start_at + options['duration']
+        workers = [
+            {
+                'seed': options['seed'] * 1000 + index,
+                'username': data['usernames'][index % len(data['usernames'])],
+                'mix': mix,
+                'data': data,
+                'start_at': start_at,
+                'deadline': deadline,
+                'retries': options['retries'],
+                'backoff': options['backoff'],
+                'multiprocess': multiprocess,
+            }
+            for index in range(options['workers'])
+        ]
+        # Открытое соединение нельзя делить с дочерними процессами.
+        connections.close_all()
+        if multiprocess:
+            # Только fork: процесс, запущенный через spawn или forkserver,
+            # заново прочитает settings и пойдёт в рабочую базу, а не в
+            # тестовую, имя которой подменено в этом процессе.
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            )
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+        with pool:
+            worker_results = list(pool.map(run_worker, workers))
+        elapsed = max(time.time(), deadline) - start_at
+        return {
+            'config': {
+                key: options[key]
+                for key in ('workers', 'mode', 'duration', 'retries',
+                            'busy_timeout', 'users', 'posts', 'comments')
+            },
+            'mix': mix,
+            **summarize(worker_results, elapsed),
+        }
+
+    def print_report(self, report):
+        columns = (
+            'requests', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors',
+            'locked', 'retries',
+        )
+        width = max(map(len, [*report['endpoints'], 'total']))
+        self.stdout.write(
+            'scenario'.ljust(width) + ''.join(
+                column.rjust(10) for column in columns
+            )
+        )
+        rows = [*report['endpoints'].items(), ('total', report['total'])]
+        for name, row in rows:
+            if row is None:
+                continue
+            self.stdout.write(name.ljust(width) + ''.join(
+                str(row[column]).rjust(10) for column in columns
+            ))
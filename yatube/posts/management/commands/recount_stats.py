@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики комментариев, постов '
+        'и подписок, исправляя накопившиеся расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки при создании недостающих строк статистики.',
+        )
+
+    def handle(self, *args, **options):
+        fixed = recount(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено постов: {fixed["posts"]}, '
+            f'строк статистики: {fixed["stats"]}'
+        ))
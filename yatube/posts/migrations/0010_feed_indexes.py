@@ -0,0 +1,78 @@
+# Generated by Django 2.2.19 on 2026-10-18 10:34
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Гонка в get_or_create могла наплодить дубли - оставляем первую запись."""
+    Follow = apps.get_model('posts', 'Follow')
+    keep = (
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(keep_id=Min('id'))
+        .values_list('keep_id', flat=True)
+    )
+    Follow.objects.exclude(id__in=list(keep)).delete()
+
+
+def rename_duplicate_slugs(apps, schema_editor):
+    """Первая группа сохраняет slug, остальным дописываем их id."""
+    Group = apps.get_model('posts', 'Group')
+    max_length = Group._meta.get_field('slug').max_length
+    duplicated = (
+        Group.objects.values('slug').annotate(total=Count('id'))
+        .filter(total__gt=1).values_list('slug', flat=True)
+    )
+    taken = set(Group.objects.values_list('slug', flat=True))
+    for slug in list(duplicated):
+        for group in Group.objects.filter(slug=slug).order_by('id')[1:]:
+            suffix = f'-{group.id}'
+            new_slug = slug[:max_length - len(suffix)] + suffix
+            attempt = 1
+            while new_slug in taken:
+                attempt += 1
+                suffix = f'-{group.id}-{attempt}'
+                new_slug = slug[:max_length - len(suffix)] + suffix
+            taken.add(new_slug)
+            Group.objects.filter(id=group.id).update(slug=new_slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            rename_duplicate_slugs, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='slug',
+            field=models.SlugField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='posts_comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='posts_post_group_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='posts_post_author_feed_idx'),
+        ),
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique'),
+        ),
+    ]
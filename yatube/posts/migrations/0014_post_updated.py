@@ -0,0 +1,25 @@
+# Generated by Django 2.2.19 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+def copy_pub_date(apps, schema_editor):
+    # Существующие посты не правились с момента публикации.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
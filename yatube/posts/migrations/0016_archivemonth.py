@@ -0,0 +1,33 @@
+# Generated by Django 2.2.19 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+def fill_archive(apps, schema_editor):
+    from posts.archive import rebuild
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMonth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64, verbose_name='Область')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+            options={
+                'verbose_name': 'Месяц архива',
+                'verbose_name_plural': 'Календарь архива',
+                'unique_together': {('scope', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_archive, migrations.RunPython.noop),
+    ]
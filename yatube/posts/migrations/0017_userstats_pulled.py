@@ -0,0 +1,28 @@
+# Generated by Django 2.2.19 on 2026-10-18 11:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled_authors(apps, schema_editor):
+    # Раньше режим вычислялся из числа подписчиков - сохраняем его.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_archivemonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='Читается при запросе'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,18 @@
+import json
+
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты с авторами и группами - всё, что нужно карточке в ленте."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -13,6 +22,12 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    # Отметка для кэша карточки поста: меняется при правке поста, а также
+    # при смене его группы, автора или картинок (см. signals.py).
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -33,19 +48,63 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # JSON-список уменьшенных копий картинки, заполняется фоновым
+    # обработчиком (posts/images.py). Пока пусто - отдаётся оригинал.
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    def image_sources(self):
+        """Источники для <picture>: по srcset на каждый формат."""
+        if not self.image_variants:
+            return []
+        by_format = {}
+        for variant in json.loads(self.image_variants):
+            by_format.setdefault(variant['format'], []).append(
+                f'{default_storage.url(variant["name"])} {variant["width"]}w'
+            )
+        return [
+            {'type': f'image/{image_format}', 'srcset': ', '.join(srcset)}
+            for image_format, srcset in by_format.items()
+        ]
+
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты читаются keyset-диапазонами по (pub_date, id) - индексы
+        # покрывают сортировку целиком, без сортировки во временном B-tree.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='posts_post_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_feed_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
 
 class Group(models.Model):
     title = models.CharField(max_length=30)
-    slug = models.SlugField(null=False)
+    slug = models.SlugField(null=False, unique=True)
     description = models.TextField()
 
     def __str__(self):
@@ -69,6 +128,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comment_thread_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -83,3 +150,117 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='на кого подписываются'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='posts_follow_unique'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост, разосланный подписчику."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост'
+    )
+    # Копия Post.pub_date: лента читается одним диапазоном по индексу
+    # (user, pub_date, post) без JOIN на таблицу постов.
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_timeline_feed_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя вместо COUNT(*) на странице."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='пользователь'
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора не рассылаются по лентам, а читаются при запросе
+    # (posts/timeline.py). Меняется только при пересечении порога вместе
+    # с дозаполнением лент, поэтому не вычисляется из follower_count.
+    pulled = models.BooleanField('Читается при запросе', default=False)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста для вкладки "Популярное", пересчитывается командой.
+
+    velocity - число комментариев с экспоненциальным затуханием, score -
+    velocity с поправкой на охват автора (число подписчиков).
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='пост'
+    )
+    velocity = models.FloatField('Скорость обсуждения', default=0)
+    score = models.FloatField('Рейтинг', default=0)
+
+    class Meta:
+        # Вкладка читает первые N строк прямо по индексу.
+        indexes = [
+            models.Index(
+                fields=['-score', '-post'], name='posts_postscore_top_idx'
+            ),
+        ]
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+
+
+class TrendingState(models.Model):
+    """Докуда дошёл последний пересчёт рейтинга (единственная строка)."""
+    computed_at = models.DateTimeField('Время пересчёта', null=True)
+    last_comment_id = models.PositiveIntegerField(
+        'Последний учтённый комментарий', default=0
+    )
+    last_post_id = models.PositiveIntegerField(
+        'Последний учтённый пост', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Состояние рейтинга'
+        verbose_name_plural = 'Состояние рейтинга'
+
+
+class ArchiveMonth(models.Model):
+    """Число постов области (сайт, группа, автор) за месяц для архива."""
+    scope = models.CharField('Область', max_length=64)
+    month = models.DateField('Месяц')
+    post_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        # Уникальный индекс (scope, month) заодно отдаёт календарь области.
+        unique_together = ('scope', 'month')
+        verbose_name = 'Месяц архива'
+        verbose_name_plural = 'Календарь архива'
@@ -0,0 +1,155 @@
+import base64
+import binascii
+import heapq
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(position):
+    """Упаковывает позицию (значение ключа, id) в непрозрачный токен."""
+    value, pk = position
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+class CursorPage(Sequence):
+    """Страница ленты с токенами соседних страниц вместо номеров."""
+
+    def __init__(self, object_list, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f'<CursorPage: {len(self)} objects>'
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре полей (значение, id).
+
+    В отличие от Paginator не делает COUNT(*) и OFFSET: каждая страница -
+    это диапазонный запрос от позиции курсора, поэтому сотая страница
+    стоит столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'id'),
+                 descending=True, transform=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.key = key
+        self.descending = descending
+        self.transform = transform
+
+    def encode_cursor(self, position):
+        return encode_cursor(position)
+
+    def decode_cursor(self, token):
+        """Возвращает позицию из токена или None, если токен битый."""
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            value, pk = raw.decode().rsplit('|', 1)
+            field = self.object_list.model._meta.get_field(self.key[0])
+            value = field.to_python(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError,
+                ValidationError):
+            return None
+        if value is None:
+            return None
+        return value, pk
+
+    def fetch(self, position, forward, limit):
+        """Список пар (позиция, объект) начиная сразу после position.
+
+        forward=True - в порядке отображения, иначе в обратном.
+        """
+        first, second = self.key
+        older = forward == self.descending
+        queryset = self.object_list
+        if position is not None:
+            value, pk = position
+            lookup = 'lt' if older else 'gt'
+            # Лишняя с виду граница first <= value даёт SQLite диапазон
+            # по индексу: одно OR он читает с начала индекса, и глубокие
+            # страницы стоили бы пропорционально глубине.
+            queryset = queryset.filter(
+                Q(**{f'{first}__{lookup}e': value}),
+                Q(**{f'{first}__{lookup}': value})
+                | Q(**{first: value, f'{second}__{lookup}': pk}),
+            )
+        prefix = '-' if older else ''
+        queryset = queryset.order_by(prefix + first, prefix + second)
+        rows = []
+        for obj in queryset[:limit]:
+            item = self.transform(obj) if self.transform else obj
+            rows.append(((getattr(obj, first), getattr(obj, second)), item))
+        return rows
+
+    def get_page(self, after=None, before=None):
+        position = self.decode_cursor(before)
+        forward = position is None
+        if forward:
+            position = self.decode_cursor(after)
+        rows = self.fetch(position, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            has_next, has_previous = has_more, position is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        has_next = has_next and bool(rows)
+        has_previous = has_previous and bool(rows)
+        return CursorPage(
+            [item for _, item in rows],
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1][0]) if has_next else None,
+            previous_cursor=(
+                self.encode_cursor(rows[0][0]) if has_previous else None
+            ),
+        )
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Сливает несколько keyset-источников с общим ключом в одну ленту."""
+
+    def __init__(self, paginators, per_page):
+        first = paginators[0]
+        super().__init__(
+            first.object_list, per_page, key=first.key,
+            descending=first.descending,
+        )
+        self.paginators = paginators
+
+    def fetch(self, position, forward, limit):
+        merged = heapq.merge(
+            *(p.fetch(position, forward, limit) for p in self.paginators),
+            key=lambda row: row[0],
+            reverse=forward == self.descending,
+        )
+        rows = []
+        for row in merged:
+            # Один и тот же пост может прийти из нескольких источников.
+            if rows and rows[-1][0] == row[0]:
+                continue
+            rows.append(row)
+            if len(rows) == limit:
+                break
+        return rows
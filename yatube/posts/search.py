@@ -0,0 +1,176 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Текст поста и название его группы копируются в виртуальную таблицу
+posts_post_fts (rowid = id поста). Сигналы поддерживают её в актуальном
+состоянии, а ``manage.py rebuild_search_index`` перестраивает целиком.
+Запрос MATCH идёт по инвертированному индексу вместо LIKE '%...%' по
+всей таблице постов; результаты ранжируются по bm25.
+"""
+import base64
+import binascii
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .pagination import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Каждое слово запроса - отдельная фраза FTS5, все обязательны.
+
+    Кавычки экранируют синтаксис FTS5, так что пользовательский ввод
+    не может сломать запрос.
+    """
+    terms = query.split()
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def index_post(post):
+    if not is_available():
+        return
+    group_title = post.group.title if post.group_id else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text, group_title) '
+            'VALUES (%s, %s, %s)',
+            [post.id, post.text, group_title],
+        )
+
+
+def index_posts(post_ids):
+    """Индексирует посты, загруженные в обход сигналов."""
+    post_ids = list(post_ids)
+    if not is_available() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text, group_title) '
+            "SELECT p.id, p.text, COALESCE(g.title, '') FROM posts_post p "
+            'LEFT JOIN posts_group g ON g.id = p.group_id '
+            f'WHERE p.id IN ({placeholders})',
+            post_ids,
+        )
+
+
+def remove_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def reindex_group(group_id, title):
+    """Обновляет название группы у всех её постов в индексе."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET group_title = %s WHERE rowid IN '
+            '(SELECT id FROM posts_post WHERE group_id = %s)',
+            [title, group_id],
+        )
+
+
+def rebuild():
+    """Перестраивает индекс с нуля; возвращает число проиндексированных постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, group_title) '
+            "SELECT p.id, p.text, COALESCE(g.title, '') FROM posts_post p "
+            'LEFT JOIN posts_group g ON g.id = p.group_id'
+        )
+        cursor.execute(f'INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES (%s)',
+                       ['optimize'])
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def filter_posts(queryset, query):
+    """Сужает queryset постов до совпадений с запросом (для админки)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    if not is_available():
+        return queryset.filter(
+            Q(text__icontains=query) | Q(group__title__icontains=query)
+        )
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (expression,),
+    ))
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация по (bm25, id): лучшие совпадения первыми."""
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            Post.objects.for_feed(), per_page, key=('rank', 'id'),
+            descending=False,
+        )
+        self.expression = match_expression(query)
+
+    def encode_cursor(self, position):
+        rank, pk = position
+        raw = f'{rank!r}|{pk}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            rank, pk = raw.decode().rsplit('|', 1)
+            return float(rank), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    def fetch(self, position, forward, limit):
+        if not self.expression:
+            return []
+        # rank - скрытый столбец FTS5, по умолчанию равный bm25().
+        older = forward == self.descending
+        lookup, order = ('<', 'DESC') if older else ('>', 'ASC')
+        sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [self.expression]
+        if position is not None:
+            rank, pk = position
+            sql += (f' AND (rank {lookup} %s '
+                    f'OR (rank = %s AND rowid {lookup} %s))')
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            hits = cursor.fetchall()
+        posts = self.object_list.in_bulk([pk for pk, _ in hits])
+        return [
+            ((rank, pk), posts[pk]) for pk, rank in hits if pk in posts
+        ]
+
+
+class FallbackSearchPaginator(CursorPaginator):
+    """Поиск подстрокой для СУБД без FTS5: по дате, без ранжирования."""
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            filter_posts(Post.objects.for_feed(), query) if query.strip()
+            else Post.objects.none(),
+            per_page,
+        )
+
+
+def search_paginator(query, per_page):
+    if is_available():
+        return SearchPaginator(query, per_page)
+    return FallbackSearchPaginator(query, per_page)
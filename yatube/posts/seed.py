@@ -0,0 +1,89 @@
+"""Наполнение базы синтетическими данными для замеров и нагрузочных тестов.
+
+Строки вставляются пачками через bulk_create в обход сигналов, поэтому
+после вставки производные данные (счётчики, ленты, поисковый индекс)
+пересчитываются целиком.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+
+from . import counters, search, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed'
+WORDS = (
+    'кот собака город лето зима море книга музыка кофе дорога друг '
+    'работа утро вечер дождь солнце поезд сад окно письмо'
+).split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(users=50, groups=5, posts=2000, comments=5000, follows=10,
+         random_seed=0):
+    """Создаёт пользователей, группы, посты, комментарии и подписки."""
+    rng = random.Random(random_seed)
+    User.objects.bulk_create(
+        [
+            User(username=f'{SEED_PREFIX}{i}', first_name=f'Автор {i}')
+            for i in range(users)
+        ],
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith=SEED_PREFIX)
+        .values_list('id', flat=True)
+    )
+    Group.objects.bulk_create([
+        Group(
+            title=f'Группа {i}', slug=f'{SEED_PREFIX}-group-{i}',
+            description=_text(rng, 10),
+        )
+        for i in range(groups)
+    ])
+    group_ids = list(
+        Group.objects.filter(slug__startswith=SEED_PREFIX)
+        .values_list('id', flat=True)
+    )
+    Post.objects.bulk_create(
+        (
+            Post(
+                text=_text(rng, rng.randint(5, 60)),
+                author_id=rng.choice(user_ids),
+                group_id=rng.choice(group_ids + [None]),
+            )
+            for _ in range(posts)
+        ),
+    )
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    # Комментарии скапливаются у немногих "вирусных" постов.
+    Comment.objects.bulk_create(
+        (
+            Comment(
+                post_id=post_ids[int(rng.paretovariate(1.2)) % len(post_ids)],
+                author_id=rng.choice(user_ids),
+                text=_text(rng, rng.randint(3, 20)),
+            )
+            for _ in range(comments)
+        ),
+    )
+    Follow.objects.bulk_create(
+        [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in rng.sample(
+                [pk for pk in user_ids if pk != user_id],
+                min(follows, len(user_ids) - 1),
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    counters.recount()
+    timeline.rebuild()
+    if search.is_available():
+        search.rebuild()
+    return user_ids
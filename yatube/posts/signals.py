@@ -0,0 +1,194 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache as feed_cache
+from . import archive, counters, follows, search, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Порядок важен: receivers вызываются в порядке подключения, и рассылка
+# в ленты должна видеть уже обновлённое число подписчиков.
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.post_added(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.post_removed(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_archive_month(sender, instance, created, **kwargs):
+    if created:
+        archive.post_added(instance)
+    elif instance.group_id != instance._initial_group_id:
+        archive.post_moved(instance, instance._initial_group_id)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_archive_month(sender, instance, **kwargs):
+    archive.post_removed(instance)
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_archive(sender, instance, **kwargs):
+    archive.group_removed(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.comment_removed(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.follow_removed(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follows(sender, instance, **kwargs):
+    follows.changed(instance.user_id)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # При правке пост может уйти в другую группу - её ленту тоже сбросим.
+    # __dict__, чтобы не дёргать отложенное (deferred) поле лишним запросом.
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    feed_cache.bump_post(
+        instance.id, instance.author_id,
+        instance.group_id, instance._initial_group_id,
+    )
+    feed_cache.bump(feed_cache.GROUPS_SCOPE)
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    # Число комментариев видно в карточках, поэтому сбрасываем и ленты поста.
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post:
+        feed_cache.bump_post(
+            instance.post_id, post['author_id'], post['group_id']
+        )
+    else:
+        feed_cache.bump(feed_cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_profile(sender, instance, **kwargs):
+    # Профиль показывает и подписчиков автора, и подписки подписчика.
+    feed_cache.bump(
+        feed_cache.author_scope(instance.author_id),
+        feed_cache.author_scope(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_groups(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.META_SCOPE)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, created=False, **kwargs):
+    # Карточки постов кэшируются по Post.updated, а в них видна группа.
+    # При удалении посты уйдут из группы UPDATE-ом без сигналов.
+    if not created:
+        Post.objects.filter(group=instance).update(updated=timezone.now())
+
+
+# Поля пользователя, которые видны в лентах и карточках постов.
+DISPLAYED_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _displayed(user):
+    # __dict__, чтобы не дёргать отложенные (deferred) поля.
+    return tuple(user.__dict__.get(field) for field in DISPLAYED_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    instance._initial_displayed = _displayed(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, **kwargs):
+    # Вход в систему, смена пароля, почты или флагов лент не меняют.
+    if created or _displayed(instance) == instance._initial_displayed:
+        return
+    feed_cache.bump(feed_cache.META_SCOPE)
+    instance.posts.update(updated=timezone.now())
+    instance._initial_displayed = _displayed(instance)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.followers_changed(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.followers_changed(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.id)
+
+
+@receiver(post_save, sender=Group)
+def reindex_group(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_group(instance.id, instance.title)
+
+
+@receiver(pre_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    # Посты останутся без группы (SET_NULL), сигналов на них не будет.
+    search.reindex_group(instance.id, '')
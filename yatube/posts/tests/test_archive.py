@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import archive
+from posts.models import ArchiveMonth, Group, Post, User
+
+
+def at(year, month, day, hour=12):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Group', slug='group', description='description'
+        )
+        cls.other_group = Group.objects.create(
+            title='Other', slug='other', description='description'
+        )
+        cls.posts = [
+            cls.create_post(at(2026, 1, 31, 23), cls.group),
+            cls.create_post(at(2026, 2, 1, 0), cls.group),
+            cls.create_post(at(2026, 2, 14), None),
+        ]
+
+    @classmethod
+    def create_post(cls, pub_date, group):
+        post = Post.objects.create(
+            text='text', author=cls.author, group=group
+        )
+        # pub_date - auto_now_add, поэтому дату ставим UPDATE-ом, а
+        # календарь пересобираем, как после импорта.
+        Post.objects.filter(pk=post.pk).update(pub_date=pub_date)
+        archive.rebuild()
+        post.refresh_from_db()
+        return post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def calendar(self, scope):
+        return list(ArchiveMonth.objects.filter(scope=scope).order_by(
+            'month'
+        ).values_list('month', 'post_count'))
+
+    def test_rebuild_counts_months_per_scope(self):
+        """Календарь собран по месяцам для сайта, группы и автора."""
+        self.assertEqual(self.calendar('site'), [
+            (at(2026, 1, 1).date(), 1), (at(2026, 2, 1).date(), 2),
+        ])
+        self.assertEqual(self.calendar(f'group:{self.group.id}'), [
+            (at(2026, 1, 1).date(), 1), (at(2026, 2, 1).date(), 1),
+        ])
+        self.assertEqual(
+            self.calendar(f'author:{self.author.id}'),
+            self.calendar('site'),
+        )
+
+    def test_signals_keep_calendar_in_sync(self):
+        """Создание, перенос и удаление поста правят календарь."""
+        post = Post.objects.create(
+            text='new', author=self.author, group=self.group
+        )
+        expected = self.calendar('site')
+        archive.rebuild()
+        self.assertEqual(self.calendar('site'), expected)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(
+            self.calendar(f'group:{self.other_group.id}'),
+            [(archive.post_month(post), 1)],
+        )
+        post.delete()
+        self.assertEqual(self.calendar(f'group:{self.other_group.id}'), [])
+        self.group.delete()
+        self.assertEqual(self.calendar(f'group:{self.group.id}'), [])
+
+    def test_month_and_day_use_date_ranges(self):
+        """Месяц и день ограничены границами периода, а не __month."""
+        cases = (
+            (reverse('posts:archive_month', args=[2026, 1]),
+             [self.posts[0]]),
+            (reverse('posts:archive_month', args=[2026, 2]),
+             [self.posts[2], self.posts[1]]),
+            (reverse('posts:archive_day', args=[2026, 2, 1]),
+             [self.posts[1]]),
+            (reverse('posts:group_archive_month', args=['group', 2026, 2]),
+             [self.posts[1]]),
+            (reverse('posts:profile_archive_day', args=['author', 2026, 2, 14]),
+             [self.posts[2]]),
+        )
+        for url, expected in cases:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(list(response.context['page_obj']), expected)
+                for query in queries.captured_queries:
+                    self.assertNotIn('django_datetime_extract', query['sql'])
+
+    def test_navigation_reads_rollup(self):
+        """Календарь на странице - из таблицы архива, без GROUP BY постов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:archive'))
+        self.assertEqual(
+            [(item['month'], item['post_count'])
+             for item in response.context['calendar']],
+            [(at(2026, 2, 1).date(), 2), (at(2026, 1, 1).date(), 1)],
+        )
+        self.assertIsNone(response.context['page_obj'])
+        for query in queries.captured_queries:
+            self.assertNotIn('GROUP BY', query['sql'])
+
+    def test_invalid_date_is_not_found(self):
+        """Несуществующая дата - 404."""
+        for url in (
+            reverse('posts:archive_month', args=[2026, 13]),
+            reverse('posts:archive_day', args=[2026, 2, 30]),
+            reverse('posts:archive_month', args=[0, 1]),
+            reverse('posts:archive_day', args=[9999, 12, 31]),
+            reverse('posts:archive_day', args=[2026, 1, 10 ** 20]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from posts.management.commands.benchmark import Command, percentile
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_compare_with_baseline(self):
+        """Рост запросов - всегда регрессия, задержки - сверх порога."""
+        baseline = {'views': {
+            'index': {'p95_ms': 10.0, 'queries': 1, 'bytes': 1000},
+        }}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+            options = {'baseline': path, 'threshold': 0.5}
+            command = Command()
+            ok = {'views': {
+                'index': {'p95_ms': 14.0, 'queries': 1, 'bytes': 1200},
+            }}
+            self.assertEqual(command.compare(ok, options), [])
+            slow = {'views': {
+                'index': {'p95_ms': 16.0, 'queries': 2, 'bytes': 1000},
+            }}
+            self.assertEqual(len(command.compare(slow, options)), 2)
+            with self.assertRaises(CommandError):
+                command.compare(ok, {**options, 'baseline': path + '.missing'})
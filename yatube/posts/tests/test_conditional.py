@@ -0,0 +1,121 @@
+import time
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Group', slug='group', description='description'
+        )
+        cls.post = Post.objects.create(
+            text='Post', author=cls.author, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Совпавший ETag даёт 304 без рендера."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                repeated = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(repeated.status_code, 304)
+                self.assertEqual(repeated['ETag'], response['ETag'])
+
+    def test_revalidation_skips_database_when_warm(self):
+        """Повторная проверка при тёплом кэше не ходит в БД."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            repeated = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост, правка и комментарий меняют валидаторы страниц."""
+        responses = {url: self.guest_client.get(url) for url in self.urls}
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Edited'
+        post.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.guest_client, url, response)
+                    .status_code,
+                    200,
+                )
+        detail_url = self.urls[-1]
+        response = self.guest_client.get(detail_url)
+        Comment.objects.create(post=self.post, author=self.reader, text='c')
+        self.assertEqual(
+            self.revalidate(self.guest_client, detail_url, response)
+            .status_code,
+            200,
+        )
+
+    def test_if_modified_since_is_not_trusted(self):
+        """Без Last-Modified правка и комментарий не дают ложного 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotIn('Last-Modified', response)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Edited'
+        post.save()
+        Comment.objects.create(post=self.post, author=self.reader, text='c')
+        since = http_date(time.time() + 60)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=since
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Edited')
+
+    def test_follow_changes_follower_profile(self):
+        """Подписка меняет валидатор профиля самого подписчика."""
+        url = reverse('posts:profile', kwargs={'username': 'reader'})
+        response = self.reader_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        repeated = self.revalidate(self.reader_client, url, response)
+        self.assertEqual(repeated.status_code, 200)
+        self.assertContains(repeated, 'Подписок: 1')
+
+    def test_etag_depends_on_user(self):
+        """Страницы гостя и пользователя различаются валидатором."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        guest = self.guest_client.get(url)
+        reader = self.reader_client.get(url)
+        self.assertNotEqual(guest['ETag'], reader['ETag'])
+        self.assertIn('private', reader['Cache-Control'])
+        self.assertEqual(
+            self.revalidate(self.reader_client, url, guest).status_code, 200
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(self.reader_client, url, reader).status_code, 200
+        )
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='text', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_views_maintain_counters(self):
+        """Комментарий, пост и подписка меняют счётчики, удаление - откатывает."""
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'comment'},
+        )
+        self.reader_client.post(reverse('posts:post_create'), {'text': 'mine'})
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.stats(self.reader).post_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+
+        Comment.objects.filter(post=self.post).delete()
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        Post.objects.filter(author=self.reader).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+
+    def test_recount_command_repairs_drift(self):
+        """recount_stats возвращает счётчики к реальным значениям."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=self.post, author=self.reader, text='c')
+        Post.objects.filter(pk=self.post.pk).update(comment_count=42)
+        UserStats.objects.filter(user=self.author).update(
+            post_count=0, follower_count=7
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount_stats', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+    def test_deleting_user_keeps_other_counters(self):
+        """Каскадное удаление пользователя не ломает чужие счётчики."""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Post.objects.create(text='fan post', author=fan)
+        fan_id = fan.id
+        fan.delete()
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertFalse(UserStats.objects.filter(user_id=fan_id).exists())
+
+    def test_drifted_zero_counters_do_not_block_deletes(self):
+        """Удаление при разошедшемся нулевом счётчике не падает."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='c'
+        )
+        post = Post.objects.create(text='mine', author=self.reader)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=0)
+        UserStats.objects.filter(user=self.reader).update(
+            post_count=0, following_count=0
+        )
+        UserStats.objects.filter(user=self.author).update(follower_count=0)
+        comment.delete()
+        post.delete()
+        Follow.objects.filter(user=self.reader).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
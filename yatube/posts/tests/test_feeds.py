@@ -0,0 +1,143 @@
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import rfc3339_date
+from posts.models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@override_settings(FEED_ITEMS=3)
+class AtomFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='description'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост номер {i} & <разметка>', author=cls.author,
+                group=cls.group if i % 2 else None,
+            ) for i in range(5)
+        ]
+        Post.objects.create(text='Чужой пост', author=cls.other)
+        cls.urls = {
+            'site': reverse('posts:feed'),
+            'group': reverse('posts:group_feed', kwargs={'slug': 'group'}),
+            'author': reverse(
+                'posts:profile_feed', kwargs={'username': 'author'}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def entries(self, response):
+        self.assertEqual(
+            response['Content-Type'], 'application/atom+xml; charset=utf-8'
+        )
+        content = b''.join(response.streaming_content) if (
+            response.streaming
+        ) else response.content
+        feed = ElementTree.fromstring(content)
+        return [
+            entry.find(f'{ATOM}content').text
+            for entry in feed.findall(f'{ATOM}entry')
+        ]
+
+    def test_feeds_contain_latest_posts(self):
+        """Ленты отдают последние FEED_ITEMS постов своей области."""
+        self.assertEqual(
+            self.entries(self.client.get(self.urls['site'])),
+            ['Чужой пост', self.posts[4].text, self.posts[3].text],
+        )
+        self.assertEqual(
+            self.entries(self.client.get(self.urls['group'])),
+            [self.posts[3].text, self.posts[1].text],
+        )
+        self.assertEqual(
+            self.entries(self.client.get(self.urls['author'])),
+            [post.text for post in self.posts[:1:-1]],
+        )
+
+    def test_streamed_then_cached(self):
+        """Первый ответ потоковый, следующие - из общего кэша без БД."""
+        url = self.urls['author']
+        first = self.client.get(url)
+        self.assertTrue(first.streaming)
+        expected = self.entries(first)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertFalse(second.streaming)
+        self.assertEqual(self.entries(second), expected)
+
+    def test_query_string_is_not_part_of_key(self):
+        """Лишние параметры не создают новых записей в кэше."""
+        url = self.urls['author']
+        first = self.client.get(url, {'junk': 1})
+        self.assertTrue(first.streaming)
+        feed = ElementTree.fromstring(b''.join(first.streaming_content))
+        self.assertEqual(
+            feed.find(f'{ATOM}id').text, f'http://testserver{url}'
+        )
+        with self.assertNumQueries(1):
+            second = self.client.get(url, {'junk': 2})
+        self.assertFalse(second.streaming)
+        Post.objects.create(text='Свежий', author=self.author)
+        self.assertEqual(self.entries(self.client.get(url))[0], 'Свежий')
+
+    def test_updated_follows_edits(self):
+        """<updated> записи и документа - время правки поста."""
+        Post.objects.filter(pk=self.posts[3].pk).update(
+            pub_date=timezone.now() - timedelta(days=1)
+        )
+        post = Post.objects.get(pk=self.posts[3].pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(self.urls['group'])
+        feed = ElementTree.fromstring(b''.join(response.streaming_content))
+        entry = next(
+            entry for entry in feed.findall(f'{ATOM}entry')
+            if entry.find(f'{ATOM}content').text == 'Исправленный пост'
+        )
+        self.assertEqual(
+            entry.find(f'{ATOM}updated').text, rfc3339_date(post.updated)
+        )
+        self.assertNotEqual(
+            entry.find(f'{ATOM}published').text,
+            entry.find(f'{ATOM}updated').text,
+        )
+        self.assertEqual(
+            feed.find(f'{ATOM}updated').text, rfc3339_date(post.updated)
+        )
+
+    def test_conditional_get(self):
+        """Опрос с ETag получает 304."""
+        for name, url in self.urls.items():
+            with self.subTest(feed=name):
+                response = self.client.get(url)
+                self.entries(response)
+                self.assertNotIn('Vary', response)
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    ).status_code,
+                    304,
+                )
+
+    def test_pages_link_feeds(self):
+        """Страницы ленты объявляют свою Atom-ленту."""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'group'})
+        )
+        self.assertContains(response, self.urls['group'])
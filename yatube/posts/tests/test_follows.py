@@ -0,0 +1,103 @@
+from array import array
+
+from core.auth import user_cache
+from django.db import DatabaseError, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from posts import follows
+from posts.models import Follow, User
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.authors[2])
+
+    def setUp(self):
+        user_cache().clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_warm_follow_check_skips_database(self):
+        """Проверка подписки по загруженному массиву не ходит в БД."""
+        with self.assertNumQueries(1):
+            follows.following_ids(self.reader.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follows.is_following(self.reader.id, self.authors[2].id)
+            )
+            self.assertFalse(
+                follows.is_following(self.reader.id, self.authors[0].id)
+            )
+
+    def test_follow_and_unfollow_drop_cached_set(self):
+        """Подписка и отписка сбрасывают массив, чтение загружает новый."""
+        follows.following_ids(self.reader.id)
+        for author in self.authors[:2]:
+            self.reader_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author.username}
+            ))
+        self.assertIsNone(
+            user_cache().get(follows.FOLLOWS_KEY.format(self.reader.id))
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(follows.following_ids(self.reader.id)),
+                sorted(author.id for author in self.authors),
+            )
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.authors[2].username},
+        ))
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                follows.is_following(self.reader.id, self.authors[2].id)
+            )
+
+    def test_cold_set_is_loaded_lazily(self):
+        """Сигнал не создаёт массив, его загружает чтение."""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertIsNone(
+            user_cache().get(follows.FOLLOWS_KEY.format(self.reader.id))
+        )
+        self.assertTrue(
+            follows.is_following(self.reader.id, self.authors[0].id)
+        )
+
+    def test_profile_shows_cached_follow_state(self):
+        """Профиль берёт признак подписки из кэша."""
+        response = self.reader_client.get(reverse(
+            'posts:profile', kwargs={'username': self.authors[2].username}
+        ))
+        self.assertTrue(response.context['following'])
+
+
+class FollowCacheTransactionTests(TransactionTestCase):
+    def setUp(self):
+        user_cache().clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+
+    def test_commit_drops_set_read_before_it(self):
+        """Массив, прочитанный из БД до коммита, после коммита сброшен."""
+        with transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+            # Так его закэшировал бы параллельный запрос до коммита.
+            follows._store(self.reader.id, array(follows.TYPECODE))
+        self.assertTrue(follows.is_following(self.reader.id, self.author.id))
+
+    def test_rollback_leaves_no_follow_in_cache(self):
+        """Откаченная подписка не остаётся в кэше."""
+        follows.following_ids(self.reader.id)
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.author)
+                raise DatabaseError
+        self.assertFalse(
+            follows.is_following(self.reader.id, self.author.id)
+        )
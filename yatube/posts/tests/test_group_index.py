@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+
+class GroupIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(2)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Group {i}', slug=f'group-{i}', description='text'
+            )
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text='a', author=author, group=cls.groups[0])
+        cls.latest = Post.objects.create(
+            text='b', author=cls.authors[0], group=cls.groups[0]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('posts:group_index')
+
+    def test_directory_shows_group_statistics(self):
+        """Каталог показывает число постов, авторов и дату последнего."""
+        groups = self.client.get(self.url).context['groups']
+        self.assertEqual(
+            [group.slug for group in groups],
+            ['group-0', 'group-1', 'group-2'],
+        )
+        first, empty = groups[0], groups[1]
+        self.assertEqual(first.post_count, 3)
+        self.assertEqual(first.author_count, 2)
+        self.assertEqual(first.last_post_date, self.latest.pub_date)
+        self.assertEqual(empty.post_count, 0)
+        self.assertIsNone(empty.last_post_date)
+
+    def test_query_count_does_not_depend_on_groups(self):
+        """Число запросов не растёт с числом групп, тёплый кэш - без БД."""
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        Group.objects.bulk_create(
+            Group(title=f'More {i}', slug=f'more-{i}', description='text')
+            for i in range(20)
+        )
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_post_write_refreshes_directory(self):
+        """Новый пост сразу виден в статистике группы."""
+        self.client.get(self.url)
+        Post.objects.create(
+            text='c', author=self.authors[1], group=self.groups[1]
+        )
+        groups = self.client.get(self.url).context['groups']
+        self.assertEqual(groups[1].post_count, 1)
+        self.assertEqual(groups[1].author_count, 1)
+
+    def test_header_links_to_directory(self):
+        """В шапке есть ссылка на каталог групп."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'href="{self.url}"')
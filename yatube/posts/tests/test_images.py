@@ -0,0 +1,99 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.images import generate_variants
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        'big.png', buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_variants_are_generated_and_rendered(self):
+        """Копии нарезаются по ширинам и форматам и попадают в srcset."""
+        post = Post.objects.create(
+            text='pic', author=self.user, image=make_png(1200, 600)
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, 'srcset')
+
+        variants = generate_variants(post.pk, post.image.name)
+        self.assertEqual(
+            {(v['format'], v['width']) for v in variants},
+            {(f, w) for f in ('webp', 'jpeg') for w in (320, 640, 960)},
+        )
+        for variant in variants:
+            self.assertTrue(default_storage.exists(variant['name']))
+        with default_storage.open(variants[0]['name']) as file:
+            self.assertEqual(Image.open(file).size, (320, 160))
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-960.jpeg 960w')
+
+    def test_small_image_is_not_upscaled(self):
+        """Маленькая картинка не растягивается до больших ширин."""
+        post = Post.objects.create(
+            text='pic', author=self.user, image=make_png(100, 50)
+        )
+        variants = generate_variants(post.pk, post.image.name)
+        self.assertEqual({v['width'] for v in variants}, {100})
+
+    def test_stale_job_does_not_overwrite_new_image(self):
+        """Задача для старой картинки не перетирает список новой."""
+        post = Post.objects.create(
+            text='pic', author=self.user, image=make_png(400, 400)
+        )
+        old_name = post.image.name
+        post.image = make_png(500, 500)
+        post.save()
+        generate_variants(post.pk, old_name)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    def test_edit_with_new_image_resets_variants(self):
+        """Новая картинка при правке сбрасывает устаревшие копии."""
+        post = Post.objects.create(
+            text='pic', author=self.user, image=make_png(400, 400)
+        )
+        generate_variants(post.pk, post.image.name)
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'pic', 'image': make_png(300, 300)},
+        )
+        post.refresh_from_db()
+        self.assertEqual(json.loads(post.image_variants or '[]'), [])
@@ -0,0 +1,68 @@
+from urllib.parse import parse_qs
+
+from django.core.management.base import CommandError
+from django.db import OperationalError
+from django.test import SimpleTestCase
+from posts.management.commands.loadtest import (
+    VirtualUser, is_locked, parse_mix, summarize,
+)
+
+
+class LoadtestTests(SimpleTestCase):
+    def test_parse_mix(self):
+        """Смесь сценариев читается из строки и проверяется."""
+        self.assertEqual(
+            parse_mix('index=3, post_create=1'),
+            {'index': 3.0, 'post_create': 1.0},
+        )
+        for value in ('unknown=1', 'index=x', 'index=-1', 'index=0'):
+            with self.subTest(value=value):
+                with self.assertRaises(CommandError):
+                    parse_mix(value)
+
+    def test_locked_errors_detected(self):
+        self.assertTrue(is_locked(OperationalError('database is locked')))
+        self.assertFalse(is_locked(OperationalError('no such table')))
+        self.assertFalse(is_locked(None))
+
+    def test_summarize_merges_workers(self):
+        """Замеры воркеров складываются по сценариям и в итог."""
+        worker = {'index': {
+            'latencies': [0.01, 0.02], 'errors': 0, 'locked': 1, 'retries': 1,
+        }}
+        other = {'post_create': {
+            'latencies': [0.1], 'errors': 1, 'locked': 3, 'retries': 2,
+        }}
+        report = summarize([worker, worker, other], elapsed=2)
+        self.assertEqual(report['endpoints']['index']['requests'], 4)
+        self.assertEqual(report['endpoints']['index']['rps'], 2)
+        self.assertEqual(report['endpoints']['index']['p95_ms'], 20)
+        self.assertEqual(report['total']['requests'], 5)
+        self.assertEqual(report['total']['locked'], 5)
+        self.assertEqual(report['total']['retries'], 4)
+        self.assertEqual(report['total']['errors'], 1)
+
+    def test_virtual_user_keeps_cookies_and_sends_csrf(self):
+        """Cookies ответа уходят в следующие запросы, POST несёт токен."""
+        seen = []
+
+        def application(environ, start_response):
+            body = environ['wsgi.input'].read(
+                int(environ.get('CONTENT_LENGTH') or 0)
+            )
+            seen.append((environ.get('HTTP_COOKIE'), parse_qs(body.decode())))
+            start_response('200 OK', [
+                ('Set-Cookie', 'csrftoken=abc; Path=/'),
+                ('Set-Cookie', 'sessionid=""; max-age=0; Path=/'),
+            ])
+            return [b'ok']
+
+        user = VirtualUser(application)
+        user.cookies['sessionid'] = 'old'
+        status, body, exception = user.request('GET', '/?q=1')
+        self.assertEqual((status, body, exception), (200, b'ok', None))
+        self.assertEqual(user.cookies, {'csrftoken': 'abc'})
+        user.request('POST', '/create/', {'text': 'hi'})
+        cookie, form = seen[-1]
+        self.assertEqual(cookie, 'csrftoken=abc')
+        self.assertEqual(form, {'text': ['hi'], 'csrfmiddlewaretoken': ['abc']})
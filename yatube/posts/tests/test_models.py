@@ -1,5 +1,6 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
-from posts.models import Group, Post, User
+from posts.models import Follow, Group, Post, User
 
 
 class PostModelTests(TestCase):
@@ -26,3 +27,14 @@ class PostModelTests(TestCase):
         group_name = group.title
         self.assertEqual(post_text, str(post))
         self.assertEqual(group_name, str(group))
+
+    def test_follow_and_group_slug_are_unique(self):
+        """Дубли подписок и слагов групп запрещены на уровне БД."""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Group.objects.create(
+                title='Дубль', slug=self.group.slug, description='-'
+            )
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cache as feed_cache
+from posts.models import Comment, Group, Post, User
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Старое', last_name='Имя'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='old-slug', description='description'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def index(self):
+        return self.client.get(reverse('posts:index'))
+
+    def test_card_is_cached_until_post_changes(self):
+        """Карточка берётся из кэша, пока не изменилась отметка updated."""
+        self.index()
+        # UPDATE в обход save(): updated прежний, кэш карточки не сброшен.
+        Post.objects.filter(pk=self.post.pk).update(text='Тайная правка')
+        feed_cache.bump(feed_cache.SITE_SCOPE)
+        self.assertContains(self.index(), 'Исходный текст')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.index()
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Исходный текст')
+
+    def test_related_changes_refresh_cards(self):
+        """Смена группы, имени автора и комментарии видны в карточках."""
+        self.index()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.save()
+        Comment.objects.create(post=self.post, author=author, text='c')
+        response = self.index()
+        self.assertContains(response, 'все записи группы new-slug')
+        self.assertContains(response, 'Новое Имя')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_deletion_refreshes_cards(self):
+        """Удалённая группа пропадает из закэшированных карточек."""
+        self.index()
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertNotContains(self.index(), 'old-slug')
+
+    def test_login_does_not_touch_posts(self):
+        """Вход в систему не сбрасывает карточки автора."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        self.client.force_login(self.author)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    def test_hidden_user_fields_do_not_touch_posts(self):
+        """Смена пароля или почты не сбрасывает карточки автора."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('new-password')
+        author.email = 'author@example.com'
+        author.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+        author.last_name = 'Фамилия'
+        author.save()
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).updated, updated
+        )
+
+    def test_hidden_user_fields_keep_feed_pages(self):
+        """Ленты сбрасываются только сменой видимого имени."""
+        def generation():
+            return feed_cache.get_generations([feed_cache.META_SCOPE])[0]
+
+        before = generation()
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('new-password')
+        author.save()
+        self.client.force_login(author)
+        self.assertEqual(generation(), before)
+        author.username = 'renamed'
+        author.save()
+        self.assertNotEqual(generation(), before)
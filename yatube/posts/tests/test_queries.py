@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.follows import following_ids
+from posts.models import Comment, Follow, Group, Post, User
+
+# Бюджет SQL-запросов на одну страницу. Он не должен зависеть от числа
+# постов на странице: рост означает N+1 в шаблоне или во view.
+# Сессия и пользователь авторизованного клиента берутся из кэша сессий.
+# При холодном кэше ещё один индексный запрос уходит на валидатор ETag.
+GUEST_QUERY_BUDGETS = {
+    'posts:index': 2,
+    'posts:group_list': 3,
+    'posts:profile': 3,
+    'posts:post_detail': 3,
+}
+# Подписки читателя тоже в кэше (posts/follows.py), так что проверка
+# подписки в профиле обходится без запроса.
+AUTHORIZED_QUERY_BUDGETS = {
+    'posts:index': 2,
+    'posts:group_list': 3,
+    'posts:profile': 3,
+    'posts:post_detail': 3,
+}
+FOLLOW_INDEX_BUDGET = 2
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Main group', slug='main', description='description'
+        )
+        cls.post = None
+        for i in range(12):
+            author = User.objects.create_user(
+                username=f'author{i}', first_name=f'Name{i}'
+            )
+            group = Group.objects.create(
+                title=f'Group {i}', slug=f'group-{i}', description='description'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            # Каждый пост со своим автором и группой, чтобы N+1 проявился
+            cls.post = Post.objects.create(
+                text=f'Post {i}', author=author, group=group
+            )
+            Post.objects.create(
+                text=f'Main post {i}', author=cls.post.author, group=cls.group
+            )
+            Comment.objects.create(post=cls.post, author=author, text='c')
+        cls.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': cls.post.author.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        # Первый запрос кладёт пользователя в кэш, как у живого читателя.
+        self.reader_client.get(reverse('about:author'))
+        following_ids(self.reader.id)
+        cache.clear()
+
+    def test_guest_query_budget(self):
+        """Гостевые страницы укладываются в фиксированный бюджет запросов."""
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                with self.assertNumQueries(GUEST_QUERY_BUDGETS[name]):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cache.clear()
+
+    def test_authorized_query_budget(self):
+        """Авторизованные страницы укладываются в свой бюджет запросов."""
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                with self.assertNumQueries(AUTHORIZED_QUERY_BUDGETS[name]):
+                    self.reader_client.get(url)
+                cache.clear()
+
+    def test_follow_index_query_budget(self):
+        """Лента подписок не делает запрос на каждый пост."""
+        with self.assertNumQueries(FOLLOW_INDEX_BUDGET):
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 10)
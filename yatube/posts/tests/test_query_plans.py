@@ -0,0 +1,157 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.pagination import encode_cursor
+
+
+class QueryPlanTests(TestCase):
+    """Основной запрос каждой ленты идёт по индексу, а не сканом таблицы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Group', slug='group', description='description'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='text', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='c')
+        cls.month = [cls.post.pub_date.year, cls.post.pub_date.month]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def query_plan(self, url, table, last=False):
+        """План первого (last=True - последнего) запроса к table с
+        сортировкой."""
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            self.client.get(url)
+        # План строим с параметрами, как его видит SQLite при запросе:
+        # с подставленными литералами оптимизатор выбирает другой.
+        matching = [
+            (sql, params) for sql, params in queries
+            if f'FROM "{table}"' in sql and 'ORDER BY' in sql
+        ]
+        sql, params = matching[-1] if last else matching[0]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, plan, table, index, search=True):
+        """search=False - только для лент без условий: там проход по
+        индексу с начала (SCAN ... USING INDEX) и есть первая страница."""
+        self.assertTrue(
+            any(index in step for step in plan if table in step),
+            f'{index} не используется: {plan}',
+        )
+        scans = [step for step in plan if step.startswith(f'SCAN {table}')]
+        if search:
+            # SCAN ... USING INDEX читает индекс с начала, а не с позиции.
+            self.assertFalse(scans, f'скан {table} вместо диапазона: {plan}')
+        else:
+            self.assertFalse(
+                any(index not in step for step in scans),
+                f'полный скан {table}: {plan}',
+            )
+        self.assertFalse(
+            any('TEMP B-TREE' in step for step in plan),
+            f'сортировка без индекса: {plan}',
+        )
+
+    def test_feed_queries_use_indexes(self):
+        cases = (
+            (reverse('posts:index'), 'posts_post', 'posts_post_feed_idx'),
+            (
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                'posts_post',
+                'posts_post_group_feed_idx',
+            ),
+            (
+                reverse('posts:profile', kwargs={'username': 'author'}),
+                'posts_post',
+                'posts_post_author_feed_idx',
+            ),
+            (
+                reverse('posts:archive_month', args=self.month),
+                'posts_post',
+                'posts_post_feed_idx',
+            ),
+            (
+                reverse(
+                    'posts:group_archive_month',
+                    args=[self.group.slug, *self.month],
+                ),
+                'posts_post',
+                'posts_post_group_feed_idx',
+            ),
+            (
+                reverse(
+                    'posts:profile_archive_day',
+                    args=['author', *self.month, self.post.pub_date.day],
+                ),
+                'posts_post',
+                'posts_post_author_feed_idx',
+            ),
+            (
+                reverse('posts:follow_index'),
+                'posts_timelineentry',
+                'posts_timeline_feed_idx',
+            ),
+            (
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+                'posts_comment',
+                'posts_comment_thread_idx',
+            ),
+        )
+        for url, table, index in cases:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertUsesIndex(
+                    self.query_plan(url, table), table, index,
+                    search=url != reverse('posts:index'),
+                )
+
+    def test_cursor_pages_search_index_range(self):
+        """Глубокая страница начинается с позиции курсора, а не с начала
+        индекса: в плане диапазон по ключу ленты."""
+        post_cursor = encode_cursor((self.post.pub_date, self.post.pk))
+        comment = Comment.objects.get(post=self.post)
+        comment_cursor = encode_cursor((comment.created, comment.pk - 1))
+        cases = (
+            (reverse('posts:index'), post_cursor,
+             'posts_post', 'posts_post_feed_idx', 'pub_date<?'),
+            (reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+             post_cursor, 'posts_post', 'posts_post_group_feed_idx',
+             'pub_date<?'),
+            (reverse('posts:profile', kwargs={'username': 'author'}),
+             post_cursor, 'posts_post', 'posts_post_author_feed_idx',
+             'pub_date<?'),
+            (reverse('posts:follow_index'), post_cursor,
+             'posts_timelineentry', 'posts_timeline_feed_idx', 'pub_date<?'),
+            (reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+             comment_cursor, 'posts_comment', 'posts_comment_thread_idx',
+             'created>?'),
+        )
+        for url, cursor, table, index, bound in cases:
+            with self.subTest(url=url):
+                cache.clear()
+                plan = self.query_plan(f'{url}?after={cursor}', table, True)
+                self.assertUsesIndex(plan, table, index)
+                self.assertTrue(
+                    any(bound in step for step in plan if table in step),
+                    f'нет диапазона {bound} по {index}: {plan}',
+                )
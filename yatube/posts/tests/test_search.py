@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+from posts.models import Group, Post, User
+from posts.search import FTS_TABLE
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='description'
+        )
+        cls.cat_post = Post.objects.create(
+            text='Кот спит на диване', author=cls.user, group=cls.group
+        )
+        cls.dog_post = Post.objects.create(
+            text='Собака гуляет, кот смотрит', author=cls.user
+        )
+        cls.other_post = Post.objects.create(
+            text='Про погоду', author=cls.user
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_search_finds_text_and_group_titles(self):
+        """Поиск находит посты по тексту и по названию группы."""
+        response = self.search('кот')
+        self.assertEqual(
+            set(response.context['page_obj']), {self.cat_post, self.dog_post}
+        )
+        response = self.search('кошки')
+        self.assertEqual(list(response.context['page_obj']), [self.cat_post])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу отражаются в индексе."""
+        post = Post.objects.get(pk=self.other_post.pk)
+        post.text = 'Теперь про кота'
+        post.save()
+        self.assertIn(post, self.search('кота').context['page_obj'])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Пушистые'
+        group.save()
+        self.assertEqual(
+            list(self.search('пушистые').context['page_obj']), [self.cat_post]
+        )
+        Post.objects.get(pk=self.cat_post.pk).delete()
+        self.assertEqual(list(self.search('пушистые').context['page_obj']), [])
+
+    def test_search_pagination_keeps_query(self):
+        """Следующая страница поиска сохраняет запрос в ссылке."""
+        for i in range(12):
+            Post.objects.create(text=f'кот номер {i}', author=self.user)
+        response = self.search('кот')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, f'after={page_obj.next_cursor}')
+        next_page = self.search('кот', after=page_obj.next_cursor)
+        rest = next_page.context['page_obj']
+        self.assertEqual(len(rest), 4)
+        self.assertFalse(set(page_obj) & set(rest))
+
+    def test_search_syntax_is_escaped(self):
+        """Спецсимволы FTS5 во вводе не ломают запрос."""
+        response = self.search('"кот OR * NEAR(')
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_rebuild_command_and_admin_search(self):
+        """Индекс перестраивается командой и используется поиском в админке."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        admin = site._registry[Post]
+        request = RequestFactory().get('/admin/posts/post/')
+        queryset, may_have_duplicates = admin.get_search_results(
+            request, Post.objects.all(), 'диване'
+        )
+        self.assertEqual(list(queryset), [self.cat_post])
@@ -0,0 +1,95 @@
+from core.auth import user_cache
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, Post, TimelineEntry, User, UserStats
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(text='old post', author=cls.author)
+
+    def setUp(self):
+        # Подписки и список популярных авторов кэшируются между тестами.
+        cache.clear()
+        user_cache().clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def follow(self):
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает её."""
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост сразу попадает в ленту подписчика."""
+        self.follow()
+        self.author_client.post(reverse('posts:post_create'), {'text': 'fresh'})
+        post = Post.objects.get(text='fresh')
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_at_read(self):
+        """Посты популярного автора не рассылаются, а читаются при запросе."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='celebrity', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
+
+    def test_merged_feed_has_no_duplicates(self):
+        """Пост из ленты и из pull-части показывается один раз."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).update(pulled=True)
+        cache.clear()
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_author_back_below_limit_fills_timelines(self):
+        """Автор, вернувшийся к рассылке, дозаполняет ленты подписчиков."""
+        readers = [self.reader] + [
+            User.objects.create_user(username=f'reader{i}') for i in range(2)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(text='pulled', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        # 2 подписчика - уже не больше порога, но ещё не заметно меньше.
+        Follow.objects.filter(user=readers[2]).delete()
+        self.assertTrue(UserStats.objects.get(user=self.author).pulled)
+        Follow.objects.filter(user=readers[1]).delete()
+        self.assertFalse(UserStats.objects.get(user=self.author).pulled)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
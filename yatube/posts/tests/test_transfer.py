@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+from datetime import date, datetime, timezone
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats,
+)
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', password='secret'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='description'
+        )
+        cls.pub_date = datetime(2020, 5, 17, 10, 30, 1, 123456, timezone.utc)
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author,
+                group=cls.group if i % 2 else None,
+            ) for i in range(5)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(pub_date=cls.pub_date)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Comment.objects.filter(post=cls.posts[0]).update(
+            created=date(2020, 5, 18)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        # Список авторов, читаемых при запросе, кэшируется между тестами.
+        cache.clear()
+
+    def export(self):
+        output = StringIO()
+        call_command('export_content', stdout=output, stderr=StringIO())
+        return output.getvalue()
+
+    def import_dump(self, dump, **options):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', delete=False, encoding='utf-8'
+        ) as file:
+            file.write(dump)
+        output = StringIO()
+        try:
+            call_command('import_content', file.name, stdout=output, **options)
+        finally:
+            os.remove(file.name)
+        return output.getvalue()
+
+    def test_export_format(self):
+        """Дамп - JSONL в порядке зависимостей, без паролей."""
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        models = [row['model'] for row in rows]
+        self.assertEqual(
+            models,
+            ['user'] * 2 + ['group'] + ['post'] * 5 + ['comment', 'follow'],
+        )
+        self.assertNotIn('password', rows[0])
+        post = next(row for row in rows if row.get('id') == self.posts[0].id)
+        self.assertEqual(post['pub_date'], self.pub_date.isoformat())
+        self.assertEqual(post['author'], 'author')
+
+    def test_round_trip_into_empty_database(self):
+        """Импорт восстанавливает контент, даты и производные данные."""
+        dump = self.export()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        report = self.import_dump(dump, batch_size=2)
+        self.assertIn('строк/с', report)
+        self.assertEqual(Post.objects.count(), 5)
+        author = User.objects.get(username='author')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.first_name, 'Имя')
+        post = Post.objects.get(pub_date=self.pub_date)
+        self.assertEqual(post.author, author)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(comment.created, date(2020, 5, 18))
+        self.assertEqual(post.comment_count, 1)
+        self.assertFalse(Post.objects.exclude(image='').exists())
+        self.assertEqual(comment.text, 'Комментарий')
+        self.assertEqual(
+            Post.objects.filter(group__slug='group').count(), 2
+        )
+        self.assertEqual(UserStats.objects.get(user=author).post_count, 5)
+        reader = User.objects.get(username='reader')
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=author).exists()
+        )
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 5)
+
+    def test_import_remaps_existing_users_and_groups(self):
+        """Существующие пользователи и группы не дублируются."""
+        self.import_dump(self.export())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertTrue(
+            User.objects.get(username='author').check_password('secret')
+        )
+
+    def test_repeated_import_is_idempotent(self):
+        """Повторный импорт узнаёт посты и комментарии по содержимому."""
+        dump = self.export()
+        Post.objects.all().delete()
+        for _ in range(2):
+            report = self.import_dump(dump, batch_size=2)
+        self.assertIn('post: создано 0, пропущено 5', report)
+        self.assertIn('comment: создано 0, пропущено 1', report)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 1)
+        post = Post.objects.get(pub_date=self.pub_date)
+        self.assertEqual(post.comments.get().text, 'Комментарий')
+        self.assertEqual(post.comment_count, 1)
+
+    def test_bad_dump(self):
+        """Неизвестная модель в дампе - ошибка команды."""
+        with self.assertRaises(CommandError):
+            self.import_dump('{"model": "secret"}\n')
+
+    def test_import_updates_only_loaded_rows(self):
+        """Без --rebuild пересчитываются только загруженные записи."""
+        dump = self.export()
+        Post.objects.all().delete()
+        other = User.objects.create_user(username='other')
+        UserStats.objects.create(user=other, post_count=42)
+        self.import_dump(dump)
+        self.assertEqual(UserStats.objects.get(user=other).post_count, 42)
+        self.assertEqual(UserStats.objects.get(user=self.author).post_count, 5)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5
+        )
+        self.import_dump(dump, rebuild=True)
+        self.assertEqual(UserStats.objects.get(user=other).post_count, 0)
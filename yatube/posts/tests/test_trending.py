@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts import trending
+from posts.models import Comment, Follow, Post, PostScore, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        cls.old = Post.objects.create(text='old', author=cls.star)
+        Comment.objects.create(post=cls.old, author=cls.reader, text='hi')
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        # Первый запуск запоминает границы; посты ниже появятся после него.
+        trending.compute(self.now)
+        self.quiet = Post.objects.create(text='quiet', author=self.author)
+        self.talked = Post.objects.create(text='talked', author=self.author)
+        self.star_post = Post.objects.create(text='star', author=self.star)
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='hi')
+
+    def score(self, post):
+        return PostScore.objects.get(post=post)
+
+    def test_first_run_skips_history(self):
+        """Посты и комментарии до первого запуска в рейтинг не попадают."""
+        trending.compute(self.now)
+        self.assertNotIn(self.old, trending.top_posts(10))
+        self.comment(self.old)
+        trending.compute(self.now)
+        self.assertEqual(self.score(self.old).velocity, 1)
+
+    def test_ranks_by_comments_and_reach(self):
+        """Обсуждаемые посты выше, при равных комментариях - охват автора."""
+        self.comment(self.talked, 2)
+        self.comment(self.star_post, 2)
+        trending.compute(self.now)
+        self.assertEqual(
+            trending.top_posts(3),
+            [self.star_post, self.talked, self.quiet],
+        )
+
+    def test_second_run_counts_only_new_comments(self):
+        """Повторный запуск учитывает только новые комментарии."""
+        self.comment(self.talked, 3)
+        trending.compute(self.now)
+        velocity = self.score(self.talked).velocity
+        trending.compute(self.now)
+        self.assertEqual(self.score(self.talked).velocity, velocity)
+        self.comment(self.talked)
+        trending.compute(self.now)
+        self.assertEqual(self.score(self.talked).velocity, velocity + 1)
+
+    def test_scores_decay_and_cold_posts_drop_out(self):
+        """Рейтинг затухает со временем, остывшие посты удаляются."""
+        self.comment(self.talked, 4)
+        trending.compute(self.now)
+        velocity = self.score(self.talked).velocity
+        later = self.now + timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        trending.compute(later)
+        self.assertAlmostEqual(
+            self.score(self.talked).velocity, velocity / 2
+        )
+        trending.compute(later + timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * 10
+        ))
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_popular_tab_reads_ranked_posts(self):
+        """Вкладка показывает посты в порядке рейтинга и видит пересчёт."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:popular')
+        self.assertEqual(list(client.get(url).context['page_obj']), [])
+        self.comment(self.talked, 2)
+        trending.compute(self.now)
+        response = client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.talked, self.star_post, self.quiet],
+        )
+        self.assertContains(response, reverse('posts:follow_index'))
+        with self.assertNumQueries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -1,13 +1,20 @@
-from django.test import TestCase, Client
+import shutil
+import tempfile
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from posts.models import Post, Group, User, Comment, Follow
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
-from datetime import time
 from django.core.cache import cache
-import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Картинки постов пишем во временную папку, а не в настоящий media/.
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostContextTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -63,6 +70,11 @@ class PostContextTests(TestCase):
             user=cls.follower_user,
             author=cls.user)
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -85,7 +97,8 @@ class PostContextTests(TestCase):
         first_post = response.context['page_obj'][0]
         self.assertTrue(first_post.image, 'Изображение отсутствует в посте')
         # Проверяем, что на второй странице 3 поста
-        response = self.authorized_client.get(reverse('posts:index') + '?page=2')
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(reverse('posts:index') + f'?after={next_cursor}')
         self.assertEqual(len(response.context['page_obj']), 4)
 
     def test_group_posts_page_context_and_pagination(self):
@@ -102,7 +115,8 @@ class PostContextTests(TestCase):
         first_post = response.context['page_obj'][0]
         self.assertTrue(first_post.image, 'Изображение отсутствует в посте')
         # Проверяем, что на второй странице 3 поста
-        response = self.authorized_client.get(reverse('posts:group_list', kwargs={'slug': self.group.slug}) + '?page=2')
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(reverse('posts:group_list', kwargs={'slug': self.group.slug}) + f'?after={next_cursor}')
         self.assertEqual(len(response.context['page_obj']), 4)
 
     def test_profile_page_context_and_pagination(self):
@@ -118,9 +132,38 @@ class PostContextTests(TestCase):
         first_post = response.context['page_obj'][0]
         self.assertTrue(first_post.image, 'Изображение отсутствует в посте')
         # Проверяем, что на второй странице 4 поста
-        response = self.authorized_client.get(reverse('posts:profile', kwargs={'username': self.user.username}) + '?page=2')
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(reverse('posts:profile', kwargs={'username': self.user.username}) + f'?after={next_cursor}')
         self.assertEqual(len(response.context['page_obj']), 4)
 
+    def test_cursor_pagination_round_trip(self):
+        """Курсор ?before= возвращает на предыдущую страницу."""
+        first_page = self.guest_client.get(reverse('posts:index')).context['page_obj']
+        self.assertFalse(first_page.has_previous)
+        self.assertTrue(first_page.has_next)
+        second_page = self.guest_client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        ).context['page_obj']
+        self.assertTrue(second_page.has_previous)
+        self.assertFalse(second_page.has_next)
+        self.assertEqual(
+            set(first_page.object_list) & set(second_page.object_list), set()
+        )
+        back_page = self.guest_client.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(back_page.object_list, first_page.object_list)
+        self.assertFalse(back_page.has_previous)
+
+    def test_cursor_pagination_bad_token_and_no_count(self):
+        """Битый курсор отдаёт первую страницу, а COUNT(*) не выполняется."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index') + '?after=%%%bad')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+
     def test_post_detail_page_context(self):
         """Проверка контекста страницы поста."""
         response = self.authorized_client.get(reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
@@ -173,6 +216,30 @@ class PostContextTests(TestCase):
         comments = response.context['comments']
         self.assertIn(self.comment, comments)
 
+    def test_post_comments_are_paginated(self):
+        """Первая страница комментариев на странице поста, остальные - подгрузкой"""
+        post = self.posts[1]
+        other = User.objects.create_user(username='commentator')
+        for i in range(25):
+            Comment.objects.create(post=post, author=other if i % 2 else self.user, text=f'comment {i}')
+        response = self.guest_client.get(reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'comment 0')
+        self.assertTrue(comments.has_next)
+        url = reverse('posts:post_comments', kwargs={'post_id': post.pk})
+        self.assertContains(response, f'{url}?after={comments.next_cursor}')
+        # Пост и страница комментариев вместе с авторами - два запроса
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(f'{url}?after={comments.next_cursor}')
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'comment {i}' for i in range(20, 25)],
+        )
+        self.assertFalse(response.context['comments'].has_next)
+        self.assertContains(response, 'commentator')
+
     def test_post_comment_only_authorized_user(self):
         """Проверям что только авторизованный юзер может комментить"""
         response = self.guest_client.post(
@@ -184,17 +251,37 @@ class PostContextTests(TestCase):
         self.assertFalse(Comment.objects.filter(text='blablabla').exists())
 
     def test_cache_work_in_index_page(self):
-        """Проверям корректную работу кэща index_page"""
-        response = self.authorized_client.get(reverse('posts:index'))
+        """Кэш главной отдаётся без запросов к постам и сбрасывается новым постом"""
+        response = self.guest_client.get(reverse('posts:index'))
         content_before = response.content
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(content_before, response.content)
         Post.objects.create(text='blasdad', author=self.user, group=self.group)
-        response = self.authorized_client.get(reverse('posts:index'))
-        content_after = response.content
-        self.assertEqual(content_before, content_after)
-        time.sleep(20)
-        response = self.authorized_client.get(reverse('posts:index'))
-        content_update = response.content
-        self.assertNotEqual(content_before, content_update)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(content_before, response.content)
+        self.assertContains(response, 'blasdad')
+
+    def test_cache_invalidation_is_scoped(self):
+        """Пост в другой группе не сбрасывает кэш чужой группы"""
+        group_url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(group_url)
+        Post.objects.create(text='elsewhere', author=self.user, group=self.other_group)
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(group_url)
+        self.assertNotContains(response, 'elsewhere')
+        self.post.text = 'edited text'
+        self.post.save()
+        response = self.guest_client.get(group_url + f'?after={response.context["page_obj"].next_cursor}')
+        self.assertContains(response, 'edited text')
+
+    def test_cache_of_post_comments(self):
+        """Новый комментарий сразу виден на странице поста"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, text='fresh comment')
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'fresh comment')
 
     def test_auhh_user_can_follow_unfollow(self):
         """Проверка авториз. польз. можете подписываться и отписываться"""
@@ -209,8 +296,8 @@ class PostContextTests(TestCase):
     def test_follow_index_page_context(self):
         """Проверка контекста страницы подписок."""
         response = self.authorized_follower_client.get(reverse('posts:follow_index'))
-        self.assertIn('posts', response.context)
-        self.assertIn(self.new_post, response.context['posts'])
+        self.assertIn('page_obj', response.context)
+        self.assertIn(self.new_post, response.context['page_obj'])
         # Проверяем, что посты от неподписанных пользователей не отображаются
         response_non_follower = self.authorized_non_follower_client.get(reverse('posts:follow_index'))
-        self.assertNotIn(self.new_post, response_non_follower.context['posts'])
+        self.assertNotIn(self.new_post, response_non_follower.context['page_obj'])
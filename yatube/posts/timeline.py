@@ -0,0 +1,192 @@
+"""Лента подписок по схеме fan-out-on-write.
+
+Новый пост сразу раскладывается по лентам подписчиков пачками INSERT,
+поэтому страница /follow/ - это один диапазонный запрос по индексу
+TimelineEntry. Авторы с очень большим числом подписчиков не рассылаются:
+их посты подтягиваются при чтении (pull) и сливаются с лентой. Режим
+автора хранится в UserStats.pulled и меняется только при пересечении
+порога; возвращаясь к рассылке, автор дозаполняет ленты подписчиков.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .follows import following_ids
+from .models import Follow, Post, TimelineEntry, UserStats
+from .pagination import CursorPaginator, MergedCursorPaginator
+
+PULL_AUTHORS_KEY = 'timeline:pull-authors'
+# К рассылке автор возвращается, только когда подписчиков заметно меньше
+# порога: иначе подписки и отписки на границе раз за разом раскладывали
+# бы его посты по всем лентам.
+PUSH_BACK_RATIO = 0.9
+
+
+def _entries(user_ids, posts):
+    return (
+        TimelineEntry(user_id=user_id, post_id=post.id, pub_date=post.pub_date)
+        for user_id in user_ids
+        for post in posts
+    )
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def pull_authors():
+    """Множество id авторов, чьи посты читаются при запросе.
+
+    Таких авторов единицы, поэтому множество общее и кэшируется ненадолго.
+    Рассылка и чтение смотрят в одну и ту же копию, а смена режима
+    автора (followers_changed) сбрасывает её.
+    """
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(UserStats.objects.filter(
+            pulled=True
+        ).values_list('user_id', flat=True))
+        cache.set(
+            PULL_AUTHORS_KEY, authors, settings.TIMELINE_PULL_CACHE_TIMEOUT
+        )
+    return authors
+
+
+def is_pull_author(author_id):
+    """Автор слишком популярен, чтобы рассылать его посты при записи."""
+    return author_id in pull_authors()
+
+
+def pull_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются при запросе."""
+    pulled = pull_authors()
+    if not pulled:
+        return []
+    return [
+        author_id for author_id in following_ids(user.id)
+        if author_id in pulled
+    ]
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    _bulk_insert(_entries(follower_ids, [post]))
+
+
+def add_posts(post_ids):
+    """Рассылает подписчикам посты, загруженные в обход сигналов."""
+    by_author = defaultdict(list)
+    posts = Post.objects.filter(pk__in=post_ids).only(
+        'id', 'pub_date', 'author_id'
+    )
+    for post in posts.iterator():
+        by_author[post.author_id].append(post)
+    pulled = pull_authors()
+    for author_id, author_posts in by_author.items():
+        if author_id in pulled:
+            continue
+        follower_ids = (
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True)
+            .iterator()
+        )
+        _bulk_insert(_entries(follower_ids, author_posts))
+
+
+def _recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .only('id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту свежие посты автора после подписки."""
+    if is_pull_author(author_id):
+        return
+    _bulk_insert(_entries([user_id], _recent_posts(author_id)))
+
+
+def _set_pulled(author_id, pulled):
+    UserStats.objects.filter(user_id=author_id).update(pulled=pulled)
+    cache.delete(PULL_AUTHORS_KEY)
+
+
+def followers_changed(author_id):
+    """Переводит автора между рассылкой и чтением при запросе, когда
+    число его подписчиков пересекло порог."""
+    stats = UserStats.objects.filter(user_id=author_id).values(
+        'follower_count', 'pulled'
+    ).first()
+    if stats is None:
+        return
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if not stats['pulled'] and stats['follower_count'] > limit:
+        _set_pulled(author_id, True)
+    elif (stats['pulled']
+          and stats['follower_count'] <= limit * PUSH_BACK_RATIO):
+        _set_pulled(author_id, False)
+        # Посты, написанные в режиме чтения, не лежат ни в одной ленте.
+        follower_ids = (
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True)
+            .iterator()
+        )
+        _bulk_insert(_entries(follower_ids, _recent_posts(author_id)))
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def follow_feed_paginator(user, per_page):
+    """Пагинатор ленты подписок: материализованная часть плюс pull-авторы."""
+    timeline = CursorPaginator(
+        TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ),
+        per_page,
+        key=('pub_date', 'post_id'),
+        transform=lambda entry: entry.post,
+    )
+    pulled = pull_author_ids(user)
+    if not pulled:
+        return timeline
+    return MergedCursorPaginator(
+        [timeline, CursorPaginator(
+            Post.objects.for_feed().filter(author_id__in=pulled), per_page
+        )],
+        per_page,
+    )
+
+
+def rebuild():
+    """Заново раскладывает посты по лентам всех подписок (после массовой
+    загрузки данных в обход сигналов)."""
+    UserStats.objects.update(pulled=False)
+    UserStats.objects.filter(
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(pulled=True)
+    cache.delete(PULL_AUTHORS_KEY)
+    TimelineEntry.objects.all().delete()
+    for follow in Follow.objects.iterator():
+        backfill(follow.user_id, follow.author_id)
@@ -0,0 +1,128 @@
+"""Рейтинг постов для вкладки "Популярное".
+
+Рейтинг не считается при запросе: команда ``manage.py compute_trending``
+периодически переносит в таблицу PostScore только то, что появилось с
+прошлого запуска. Накопленная скорость обсуждения всех постов сначала
+затухает одним UPDATE (период полураспада TRENDING_HALF_LIFE), затем к
+ней прибавляются новые комментарии и посты. Итоговый рейтинг - скорость,
+умноженная на охват автора 1 + ln(1 + подписчики). Строки, остывшие ниже
+TRENDING_MIN_VELOCITY, удаляются, так что таблица остаётся маленькой, а
+вкладка читает первые N строк по индексу (-score, -post).
+
+Первый запуск только запоминает текущие границы: вся история сайта
+попала бы в рейтинг без затухания, и старые обсуждения вытеснили бы
+свежие. Вкладка наполняется активностью после этого запуска.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from . import cache as feed_cache
+from .models import Comment, Post, PostScore, TrendingState
+
+# Сколько id за раз уходит в IN (...): SQLite ограничивает число параметров.
+CHUNK_SIZE = 500
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def reach(follower_count):
+    return 1 + math.log1p(follower_count or 0)
+
+
+def _last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def _gains(state):
+    """Прирост скорости по постам с прошлого запуска и новые границы."""
+    gains = Counter()
+    last_comment_id = _last_id(Comment) or state.last_comment_id
+    comments = Comment.objects.filter(
+        id__gt=state.last_comment_id, id__lte=last_comment_id
+    ).order_by().values('post_id').annotate(total=Count('id'))
+    for row in comments:
+        gains[row['post_id']] += row['total']
+    last_post_id = _last_id(Post) or state.last_post_id
+    # Свежий пост получает небольшой стартовый вес, чтобы посты
+    # популярных авторов попадали во вкладку ещё до комментариев.
+    new_posts = Post.objects.filter(
+        id__gt=state.last_post_id, id__lte=last_post_id
+    ).values_list('id', flat=True)
+    for post_id in new_posts.iterator():
+        gains[post_id] += settings.TRENDING_POST_WEIGHT
+    return gains, last_comment_id, last_post_id
+
+
+def compute(now=None):
+    """Инкрементальный пересчёт рейтинга; возвращает число
+    обновлённых, добавленных и удалённых строк."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        state = TrendingState.objects.select_for_update().filter(
+            pk=1
+        ).first() or TrendingState.objects.create(
+            pk=1,
+            last_comment_id=_last_id(Comment),
+            last_post_id=_last_id(Post),
+        )
+        if state.computed_at is not None:
+            elapsed = max((now - state.computed_at).total_seconds(), 0)
+            decay = 0.5 ** (elapsed / settings.TRENDING_HALF_LIFE)
+            PostScore.objects.update(
+                velocity=F('velocity') * decay, score=F('score') * decay
+            )
+        gains, state.last_comment_id, state.last_post_id = _gains(state)
+
+        updated, created = [], []
+        for chunk in _chunks(gains):
+            scores = PostScore.objects.in_bulk(chunk)
+            followers = dict(Post.objects.filter(id__in=chunk).values_list(
+                'id', 'author__stats__follower_count'
+            ))
+            for post_id in chunk:
+                if post_id not in followers:
+                    continue  # пост удалён после комментария
+                score = scores.get(post_id)
+                if score is None:
+                    score = PostScore(post_id=post_id)
+                    created.append(score)
+                else:
+                    updated.append(score)
+                score.velocity += gains[post_id]
+                score.score = score.velocity * reach(followers[post_id])
+        PostScore.objects.bulk_update(updated, ['velocity', 'score'])
+        PostScore.objects.bulk_create(created)
+        removed, _ = PostScore.objects.filter(
+            velocity__lt=settings.TRENDING_MIN_VELOCITY
+        ).delete()
+
+        state.computed_at = now
+        state.save()
+    feed_cache.bump(feed_cache.TRENDING_SCOPE)
+    return {
+        'updated': len(updated), 'created': len(created), 'removed': removed,
+    }
+
+
+def computed_at():
+    """Время последнего пересчёта или None, если его ещё не было."""
+    return TrendingState.objects.filter(pk=1).values_list(
+        'computed_at', flat=True
+    ).first()
+
+
+def top_posts(limit):
+    """Первые limit постов рейтинга с авторами и группами."""
+    scores = PostScore.objects.select_related(
+        'post__author', 'post__group'
+    ).order_by('-score', '-post')[:limit]
+    return [score.post for score in scores]
@@ -1,18 +1,74 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/', feeds.site_feed, name='feed'),
+    path('popular/', views.popular, name='popular'),
+    path('archive/', views.site_archive, name='archive'),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.site_archive,
+        name='archive_month'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/<int:day>/',
+        views.site_archive,
+        name='archive_day'
+    ),
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/feed/', feeds.group_feed, name='group_feed'),
+    path(
+        'group/<slug:slug>/archive/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.group_archive,
+        name='group_archive_month'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/<int:day>/',
+        views.group_archive,
+        name='group_archive_day'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/',
+        feeds.profile_feed,
+        name='profile_feed'
+    ),
+    path(
+        'profile/<str:username>/archive/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.profile_archive,
+        name='profile_archive_month'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/<int:day>/',
+        views.profile_archive,
+        name='profile_archive_day'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
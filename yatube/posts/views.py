@@ -1,70 +1,300 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, get_list_or_404, redirect
-from .models import Post, Group, User, Follow
+from .models import Post, Group, User, Follow, Comment
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404
+from django.urls import reverse
 from .forms import PostForm, CommentForm
-from django.views.decorators.cache import cache_page
 from django.core.exceptions import ValidationError
+from . import archive
+from . import cache as feed_cache
+from .conditional import conditional_render, get_etag, latest_position
+from .counters import get_stats
+from .follows import is_following
+from .images import schedule_variants
+from .pagination import CursorPaginator
+from .search import search_paginator
+from .timeline import follow_feed_paginator
+from .trending import computed_at, top_posts
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+def get_cursor_page(request, paginator):
+    """Страница по курсорам ?after= / ?before= из запроса."""
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def get_feed_page(request, queryset, scopes):
+    """Страница ленты из кэша, пока не изменились данные её областей."""
+    return feed_cache.get_or_build(
+        scopes,
+        (request.path, request.GET.get('after'), request.GET.get('before')),
+        lambda: get_cursor_page(
+            request, CursorPaginator(queryset, POSTS_PER_PAGE)
+        ),
+    )
+
+
+def feed_response(request, queryset, scopes, render_page):
+    """304 по позиции свежего поста ленты, иначе render_page()."""
+    etag = get_etag(request, scopes, lambda: latest_position(queryset))
+    return conditional_render(request, etag, render_page)
 
 
-@cache_page(20, key_prefix='index_page')
 def index(request):
     temp = 'posts/index.html'
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'page_obj': page_obj,
-    }
-    return render(request, temp, context)
+    queryset = Post.objects.for_feed()
+    scopes = [feed_cache.SITE_SCOPE]
+
+    def render_page():
+        context = {
+            'page_obj': get_feed_page(request, queryset, scopes),
+            'index': True,
+        }
+        return render(request, temp, context)
+
+    return feed_response(request, queryset, scopes, render_page)
+
+
+def popular(request):
+    # Состав вкладки меняет пересчёт рейтинга, а правка или удаление
+    # поста - сама карточка, поэтому нужна и область всего сайта.
+    scopes = [feed_cache.SITE_SCOPE, feed_cache.TRENDING_SCOPE]
+
+    def render_page():
+        context = {
+            'page_obj': feed_cache.get_or_build(
+                scopes, ('popular',),
+                lambda: top_posts(settings.TRENDING_POSTS),
+            ),
+            'popular': True,
+        }
+        return render(request, 'posts/popular.html', context)
+
+    etag = get_etag(request, scopes, lambda: (computed_at(),))
+    return conditional_render(request, etag, render_page)
+
+
+def get_group_directory():
+    """Все группы со статистикой постов одним агрегирующим запросом."""
+    return list(Group.objects.annotate(
+        post_count=Count('posts'),
+        last_post_date=Max('posts__pub_date'),
+        author_count=Count('posts__author', distinct=True),
+    ).order_by('title'))
+
+
+def group_index(request):
+    scopes = [feed_cache.GROUPS_SCOPE]
+
+    def render_page():
+        context = {
+            'groups': feed_cache.get_or_build(
+                scopes, ('groups',), get_group_directory
+            ),
+        }
+        return render(request, 'posts/group_index.html', context)
+
+    return feed_response(request, Post.objects.all(), scopes, render_page)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    queryset = Post.objects.for_feed().filter(group=group)
+    scopes = [feed_cache.group_scope(group.id)]
 
-    context = {
-        'group': group,
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/group_list.html', context)
+    def render_page():
+        context = {
+            'group': group,
+            'page_obj': get_feed_page(request, queryset, scopes),
+        }
+        return render(request, 'posts/group_list.html', context)
+
+    return feed_response(request, queryset, scopes, render_page)
 
 
 def profile(request, username):
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    queryset = user.posts.for_feed()
+    # Подписка на автора тоже сбрасывает эту область, см. signals.py.
+    scopes = [feed_cache.author_scope(user.id)]
+
+    def render_page():
+        following = (
+            request.user.is_authenticated
+            and is_following(request.user.id, user.id)
+        )
+        context = {
+            'profile_user': user,
+            'page_obj': get_feed_page(request, queryset, scopes),
+            'stats': get_stats(user),
+            'following': following,
+        }
+        return render(request, 'posts/profile.html', context)
+
+    return feed_response(request, queryset, scopes, render_page)
+
+
+def archive_page(request, queryset, scope, url_prefix, url_args, context,
+                 year=None, month=None, day=None):
+    """Страница архива области: календарь месяцев и посты периода.
+
+    Без года - только календарь. url_prefix - начало имён маршрутов
+    ('', 'group_', 'profile_'), url_args - их аргументы до даты.
+    """
+    period = None
+    if year is not None:
+        try:
+            start, end, period = archive.period_bounds(year, month, day)
+        except (ValueError, OverflowError):
+            raise Http404('Такой даты нет')
+        queryset = queryset.filter(pub_date__gte=start, pub_date__lt=end)
+    scopes = [scope]
+
+    def render_page():
+        calendar = [
+            {
+                'month': first_day,
+                'post_count': post_count,
+                'url': reverse(
+                    f'posts:{url_prefix}archive_month',
+                    args=[*url_args, first_day.year, first_day.month],
+                ),
+                'active': (period is not None
+                           and first_day == period.replace(day=1)),
+            }
+            for first_day, post_count in archive.months(scope)
+        ]
+        context.update({
+            'calendar': calendar,
+            'period': period,
+            'by_day': day is not None,
+            'archive_url': reverse(
+                f'posts:{url_prefix}archive', args=url_args
+            ),
+            'page_obj': (
+                None if period is None
+                else get_feed_page(request, queryset, scopes)
+            ),
+        })
+        return render(request, 'posts/archive.html', context)
+
+    return feed_response(request, queryset, scopes, render_page)
+
+
+def site_archive(request, year=None, month=None, day=None):
+    return archive_page(
+        request, Post.objects.for_feed(), feed_cache.SITE_SCOPE, '', [],
+        {'title': 'Архив'}, year, month, day,
+    )
+
+
+def group_archive(request, slug, year=None, month=None, day=None):
+    group = get_object_or_404(Group, slug=slug)
+    return archive_page(
+        request, group.posts.for_feed(), feed_cache.group_scope(group.id),
+        'group_', [slug],
+        {'title': f'Архив сообщества {group.title}', 'group': group},
+        year, month, day,
+    )
+
+
+def profile_archive(request, username, year=None, month=None, day=None):
     user = get_object_or_404(User, username=username)
-    post_list = user.posts.all().order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = Follow.objects.filter(user=request.user, author=user).exists()
-    context = {
-        'profile_user': user,
-        'page_obj': page_obj,
-        'following': following,
-    }
-    return render(request, 'posts/profile.html', context)
+    return archive_page(
+        request, user.posts.for_feed(), feed_cache.author_scope(user.id),
+        'profile_', [username],
+        {'title': f'Архив пользователя {username}', 'profile_user': user},
+        year, month, day,
+    )
+
+
+def get_comments_page(request, post_id):
+    """Страница комментариев, от старых к новым, вместе с авторами."""
+    return feed_cache.get_or_build(
+        [feed_cache.post_scope(post_id)],
+        ('comments', post_id, request.GET.get('after'),
+         request.GET.get('before')),
+        lambda: get_cursor_page(request, CursorPaginator(
+            Comment.objects.filter(post_id=post_id).select_related('author'),
+            COMMENTS_PER_PAGE,
+            key=('created', 'id'),
+            descending=False,
+        )),
+    )
+
+
+def post_etag(request, post):
+    """ETag страницы поста: сам пост, его комментарии и автор."""
+    # Статистика автора в карточке меняется вместе с его областью.
+    scopes = [
+        feed_cache.post_scope(post.id), feed_cache.author_scope(post.author_id)
+    ]
+    return get_etag(request, scopes, lambda: (
+        post.pub_date,
+        post.comment_count,
+        *latest_position(
+            Comment.objects.filter(post_id=post.id), key=('created', 'id')
+        ),
+    ))
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, username=post.author)
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
-    # Здесь код запроса к модели и создание словаря контекста
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'), id=post_id
+    )
+    author = post.author
+
+    def render_page():
+        form = CommentForm(request.POST or None)
+        # Здесь код запроса к модели и создание словаря контекста
+        context = {
+            'post': post,
+            'author': author,
+            'author_stats': get_stats(author),
+            'form': form,
+            'comments': get_comments_page(request, post.id),
+        }
+        return render(request, 'posts/post_detail.html', context)
+
+    return conditional_render(
+        request, post_etag(request, post), render_page
+    )
+
+
+def post_comments(request, post_id):
+    """Следующие страницы комментариев для подгрузки на странице поста."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
     context = {
         'post': post,
-        'author': author,
-        'form': form,
-        'comments': comments,
+        'comments': get_comments_page(request, post.id),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = get_cursor_page(
+        request, search_paginator(query, POSTS_PER_PAGE)
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
 
     if request.method == 'POST':
@@ -77,6 +307,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             form.save()
+            if post.image:
+                schedule_variants(post)
             return redirect('posts:profile', username=request.user.username)
     form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
@@ -95,7 +327,13 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
+            new_image = 'image' in form.changed_data
+            if new_image:
+                # Старые копии не подходят, до новых показываем оригинал.
+                post.image_variants = ''
             form.save()
+            if new_image and post.image:
+                schedule_variants(post)
             return redirect('posts:post_detail', post_id=post.id)
     else:
         form = PostForm(instance=post)
@@ -107,6 +345,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     # Получите пост и сохраните его в переменную post.
     post = get_object_or_404(Post, pk=post_id)
@@ -121,13 +360,15 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    posts = Post.objects.filter(author__following__user=user)
-    context = {'posts': posts}
+    page_obj = get_cursor_page(
+        request, follow_feed_paginator(request.user, POSTS_PER_PAGE)
+    )
+    context = {'page_obj': page_obj, 'follow': True}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -139,6 +380,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     author = get_object_or_404(User, username=username)
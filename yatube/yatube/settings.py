@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -46,16 +47,21 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.PrecompressedStaticMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -97,6 +103,52 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core/routers.py). Локально можно поднять
+# второй файл SQLite: YATUBE_REPLICA_DB=replica.sqlite3, затем
+# manage.py sync_replica копирует в него основную базу.
+if os.environ.get('YATUBE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['YATUBE_REPLICA_DB'],
+        # В тестах реплика - та же база, что и основная; тестам, которые
+        # читают с неё, нужен databases = {'default', 'replica'}.
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы
+REPLICA_PIN_SECONDS = 10
+
+
+# Страницы лент и фрагменты - в default, сессии и вошедшие пользователи -
+# в отдельном кэше, чтобы вытеснение лент их не задевало. В продакшене оба
+# должны быть общими для всех воркеров (memcached/redis): сброс записи
+# пользователя при смене пароля должен быть виден каждому процессу.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+# Вошедший пользователь читается из кэша (core/auth.py). ModelBackend
+# остаётся для сессий, созданных до включения кэша.
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Сигналы сбрасывают пользователя только в кэше своего процесса, поэтому
+# при нескольких воркерах кэш 'sessions' должен быть общим (Memcached,
+# Redis): LocMemCache годится лишь для разработки и тестов, и
+# ``manage.py check --deploy`` с ним падает (core.E001). Запись в обход
+# сигналов, например QuerySet.update(is_active=False), видна через
+# USER_CACHE_TIMEOUT секунд; 0 - не кэшировать пользователей.
+USER_CACHE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -136,6 +188,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# collectstatic кладёт сюда файлы с хешем в имени и их .gz/.br копии
+# (core/storage.py), а PrecompressedStaticMiddleware их раздаёт.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Файлы с хешем в имени не меняются - кэшируем на год.
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -149,3 +207,54 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.permission_denied_view'
+
+# Лента подписок (fan-out-on-write)
+# Авторы с большим числом подписчиков читаются при запросе, а не рассылаются
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BATCH_SIZE = 1000
+# Сколько последних постов автора попадает в ленту сразу после подписки
+TIMELINE_BACKFILL_SIZE = 100
+# Как долго живёт общий список таких авторов (posts/timeline.py)
+TIMELINE_PULL_CACHE_TIMEOUT = 60
+# Массивы подписок пользователей (posts/follows.py) правятся сигналами
+FOLLOW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Рейтинг "Популярного" (posts/trending.py): скорость обсуждения
+# затухает вдвое за TRENDING_HALF_LIFE секунд, остывшие посты выпадают.
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_MIN_VELOCITY = 0.05
+# Стартовый вес нового поста относительно одного комментария
+TRENDING_POST_WEIGHT = 0.5
+TRENDING_POSTS = 20
+
+# Закэшированные страницы лент сбрасываются сигналами через счётчики
+# поколений (posts/cache.py), поэтому TTL может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Записей в Atom-лентах сайта, групп и авторов (posts/feeds.py)
+FEED_ITEMS = 20
+
+# Уменьшенные копии картинок постов (posts/images.py)
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+
+# Метрики запросов (core/metrics.py): каждый воркер сбрасывает свой снимок
+# в METRICS_DIR не чаще раза в METRICS_FLUSH_INTERVAL секунд, /metrics
+# отдаёт их сумму только локальному сборщику. Снимки умерших воркеров и
+# не обновлявшиеся дольше METRICS_STALE_AFTER секунд удаляются при сборке;
+# простаивающий воркер вернёт свой снимок при следующем запросе.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_STALE_AFTER = 3600
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+# Профили запросов (core/profiling.py): снимаются по подписанному заголовку
+# X-Profile, по ?profile=1 у сотрудников или для доли запросов
+# PROFILE_SAMPLE_RATE; по PROFILE_KEEP последних на маршрут.
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'yatube-profiles')
+PROFILE_SAMPLE_RATE = 0
+PROFILE_KEEP = 50
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+PROFILE_TOP_FUNCTIONS = 40
@@ -5,13 +5,23 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls import handler403, handler404
 
+from core.views import metrics_view, profile_detail_view, profiles_view
+
 urlpatterns = [
     # импорт правил из приложения posts
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about/', include('about.urls', namespace='about'))
+    path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
+    path('profiles/', profiles_view, name='profiles'),
+    path(
+        'profiles/<str:view_name>/<str:profile_id>/',
+        profile_detail_view,
+        name='profile_detail'
+    ),
 ]
 
 if settings.DEBUG: